@@ -1,12 +1,23 @@
 # app.py
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 import pandas as pd
 import time # <-- Import time
 
 # Import functions from our utility files
-from graph_utils import create_random_weighted_graph, calculate_layout
-from pagerank_utils import pagerank_weighted_iterative
-from plot_utils import create_3d_figure
+from cache_utils import PipelineCache
+from graph_utils import GRAPH_MODELS, create_graph, calculate_layout, limit_density
+from job_utils import BackgroundJob, JobCancelled
+from metrics_utils import metrics
+from pagerank_utils import MonteCarloPageRank, pagerank_weighted_iterative, top_k_scores
+from storage_utils import DiskCSR, bundle_bytes, load_bundle, load_edge_list_bytes
+from plot_utils import (DEFAULT_MAX_EDGES, DEFAULT_MAX_NODES, RENDER_MODES, FigureTemplate,
+                        create_3d_figure, create_animated_figure, select_visible_nodes)
 
 # --- Page Configuration ---
 st.set_page_config(layout="wide", page_title="Interactive 3D PageRank", page_icon="🕸️")
@@ -18,6 +29,31 @@ try:
 except FileNotFoundError:
     explanation_content = "*(content.md not found)*\n\nPlease refer to the comments in `app.py` or create `content.md` for a detailed explanation."
 
+# --- Large Graph Limits ---
+# Link probabilities are scaled down so random graphs expect at most this many links
+MAX_EXPECTED_EDGES = 200_000
+# Beyond this many nodes the spring layout (O(N^2) per step) is replaced by the multilevel one
+SPRING_MAX_NODES = 2_000
+
+def effective_layout(method, num_nodes):
+    return 'multilevel' if method == 'spring' and num_nodes > SPRING_MAX_NODES else method
+
+# --- Shared Result Cache (across reruns and sessions) ---
+@st.cache_resource
+def get_pipeline_cache():
+    # Set PAGERANK_CACHE_DIR to spill evicted results to disk
+    return PipelineCache(max_bytes=512 * 1024 ** 2, disk_dir=os.environ.get("PAGERANK_CACHE_DIR"))
+
+pipeline_cache = get_pipeline_cache()
+
+# --- Background Executor (the pipeline runs off the script thread) ---
+# One per session, so a session's jobs never queue behind another session's.
+# Two workers: the pipeline and its Monte Carlo preview
+def get_job_executor():
+    if st.session_state.get('job_executor') is None:
+        st.session_state.job_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pagerank-job")
+    return st.session_state.job_executor
+
 # --- Initialize Session State ---
 if 'graph' not in st.session_state:
     st.session_state.graph = None
@@ -29,20 +65,89 @@ if 'graph' not in st.session_state:
     st.session_state.nodes_list = []
     st.session_state.edges_list = []
     st.session_state.is_animating = False # Flag to track animation state
+    st.session_state.figure_template = None # Static figure parts, rebuilt with graph/layout
+    st.session_state.job = None # Running pipeline job (BackgroundJob), if any
+    st.session_state.job_error = None
 
 
 # --- Sidebar Controls ---
 st.sidebar.header("⚙️ Graph & Algorithm Controls")
 
 # Graph Parameters
-num_nodes = st.sidebar.slider("Number of Nodes", 5, 50, 15, 1, key="num_nodes_slider")
-edge_prob = st.sidebar.slider("Edge Probability", 0.0, 1.0, 0.15, 0.01, key="edge_prob_slider", help="Approximate density of links.")
+EDGE_LIST_FILE = "Edge List File"
+graph_model = st.sidebar.selectbox("Graph Model", list(GRAPH_MODELS) + [EDGE_LIST_FILE], key="graph_model_select", help="Uniform random links, scale-free / community structure like real web graphs, or your own edge list.")
+num_nodes = None if graph_model == EDGE_LIST_FILE else st.sidebar.slider("Number of Nodes", 5, 20000, 15, 1, key="num_nodes_slider", help="Large graphs are drawn at reduced detail (see Rendering below).")
+uploaded_edges = None
+if graph_model == EDGE_LIST_FILE:
+    uploaded_edges = st.sidebar.file_uploader(
+        "Edge List (src, dst[, weight])", type=['csv', 'tsv', 'txt', 'bin'], key="edge_list_uploader",
+        help="CSV/TSV with integer node ids, or binary records of int32 src, int32 dst, float32 weight.")
+    model_params = {'file_sha256': hashlib.sha256(uploaded_edges.getvalue()).hexdigest() if uploaded_edges else None}
+elif graph_model == 'Barabási–Albert':
+    model_params = {'m': st.sidebar.slider("Links per New Node", 1, 10, 2, 1, key="ba_m_slider", help="Each new page links to this many existing pages, preferring popular ones.")}
+elif graph_model == 'R-MAT':
+    model_params = {'avg_degree': st.sidebar.slider("Average Out-Degree", 1.0, 20.0, 3.0, 0.5, key="rmat_degree_slider", help="Target number of links per node (power-law distributed).")}
+elif graph_model == 'Stochastic Block':
+    model_params = {
+        'num_blocks': st.sidebar.slider("Communities", 1, 10, 3, 1, key="sbm_blocks_slider"),
+        'p_in': st.sidebar.slider("Link Probability (within)", 0.0, 1.0, 0.3, 0.01, key="sbm_p_in_slider"),
+        'p_out': st.sidebar.slider("Link Probability (between)", 0.0, 1.0, 0.02, 0.01, key="sbm_p_out_slider"),
+    }
+else:
+    model_params = {'edge_prob': st.sidebar.slider("Edge Probability", 0.0, 1.0, 0.15, 0.001, format="%.3f", key="edge_prob_slider", help="Approximate density of links (scaled down automatically for large graphs).")}
+if num_nodes is not None:
+    limited_params = limit_density(graph_model, num_nodes, model_params, MAX_EXPECTED_EDGES)
+    if limited_params != model_params:
+        scaled = ", ".join(f"{limited_params[k]:.2g}" for k in model_params if limited_params[k] != model_params[k])
+        st.sidebar.caption(f"Link probability scaled down to {scaled} for {num_nodes:,} nodes "
+                           f"(about {MAX_EXPECTED_EDGES:,} links).")
+        model_params = limited_params
 graph_seed = st.sidebar.number_input("Graph Random Seed", value=42, step=1, key="graph_seed_input", help="Ensures same random graph for the same seed.")
+layout_method = st.sidebar.selectbox(
+    "3D Layout", ['spring', 'barnes_hut', 'spectral', 'multilevel'], key="layout_select",
+    format_func=lambda m: {'spring': 'Spring (NetworkX)', 'barnes_hut': 'Barnes-Hut', 'spectral': 'Spectral', 'multilevel': 'Multilevel'}[m],
+    help=f"Spring is fine for small graphs (above {SPRING_MAX_NODES:,} nodes Multilevel is used instead); the others scale to thousands of nodes.")
+if num_nodes is not None and effective_layout(layout_method, num_nodes) != layout_method:
+    st.sidebar.caption(f"Spring layout is too slow for {num_nodes:,} nodes; using Multilevel.")
 
 # PageRank Parameters
 alpha = st.sidebar.slider("Damping Factor (α)", 0.0, 1.0, 0.85, 0.01, key="alpha_slider", help="Probability the surfer follows links.")
 max_iter_calc = st.sidebar.select_slider("Max Iterations (for Calculation)", options=[10, 20, 50, 100, 200], value=100, key="max_iter_calc_slider", help="Maximum steps for calculation.")
 tol = st.sidebar.select_slider("Tolerance", options=[1.0e-4, 1.0e-5, 1.0e-6, 1.0e-7, 1.0e-8], value=1.0e-6, key="tol_slider", help="Convergence threshold.")
+top_k = st.sidebar.number_input("Top-k Nodes", 1, 1000, 20, 1, key="top_k_input", help="Number of top-ranked nodes listed in Final Scores.")
+top_k_stop = st.sidebar.checkbox("Stop once the top-k ranking settles", value=False, key="top_k_stop_checkbox",
+                                 help="Ends the calculation early when the top-k order stays the same for 3 iterations or is guaranteed by the error bound; the other scores may be less precise.")
+mc_preview = st.sidebar.checkbox("Monte Carlo preview while calculating", value=True, key="mc_preview_checkbox",
+                                 help="Shows an approximate top-k from random surfer walks within milliseconds, refined until the exact result is ready.")
+
+# Rendering (level of detail for large graphs)
+with st.sidebar.expander("🖼️ Rendering"):
+    render_mode = st.selectbox("Render Mode", RENDER_MODES, key="render_mode_select",
+                               help="'auto' switches from 3D to a 2D WebGL projection for large graphs; 'density' shows PageRank mass as a heatmap.")
+    max_render_nodes = st.number_input("Max Rendered Nodes", 100, 50000, DEFAULT_MAX_NODES, 100, key="max_render_nodes_input",
+                                       help="The top-ranked nodes are always shown; the rest are sampled.")
+    max_render_edges = st.number_input("Max Rendered Edges", 100, 200000, DEFAULT_MAX_EDGES, 1000, key="max_render_edges_input",
+                                       help="Edges beyond this budget are sampled by weight.")
+
+# Instrumentation, switched on per session (shown in the Performance panel).
+# Timers and counters add up over all sessions; the per-iteration series are kept per session
+if 'metrics_scope' not in st.session_state:
+    st.session_state.metrics_scope = uuid.uuid4().hex
+with st.sidebar.expander("📈 Performance"):
+    record_metrics = st.checkbox("Record metrics", value=False, key="metrics_checkbox",
+                                 help="Stage timers, per-iteration residuals and cache hit/miss counters.")
+    profile_run = st.checkbox("Profile with cProfile", value=False, key="profile_checkbox",
+                              disabled=not record_metrics, help="Adds noticeable overhead while computing.")
+# Passed into each job, which applies them on its own thread
+metrics_settings = {'enabled': record_metrics, 'profiling': record_metrics and profile_run,
+                    'scope': st.session_state.metrics_scope}
+metrics.use_local(**metrics_settings) # This script run (figure timers)
+
+# Saved runs (graph + layout + history bundles)
+bundle_box = st.sidebar.expander("💾 Save / Open Run")
+with bundle_box:
+    uploaded_bundle = st.file_uploader("Open Saved Run (.npz)", type=['npz'], key="bundle_uploader",
+                                       help="A run downloaded from this app; opens without recomputing.")
 
 # --- Button to Trigger Calculation / Recalculation ---
 st.sidebar.markdown("---") # Separator
@@ -50,12 +155,18 @@ recalc_pressed = st.sidebar.button("🔄 Generate Graph & Calculate PageRank", k
 
 # --- Check if parameters changed ---
 current_params = {
+    'graph_model': graph_model,
     'num_nodes': num_nodes,
-    'edge_prob': edge_prob,
+    **model_params,
     'graph_seed': graph_seed,
+    'layout_method': layout_method,
     'alpha': alpha,
     'max_iter': max_iter_calc, # Use calculation max_iter here
-    'tol': tol
+    'tol': tol,
+    'top_k': top_k if top_k_stop else None,
+    'render_mode': render_mode,
+    'max_render_nodes': max_render_nodes,
+    'max_render_edges': max_render_edges,
 }
 
 # Mark for recalculation if params changed OR if the button was explicitly pressed
@@ -64,39 +175,247 @@ if current_params != st.session_state.get('params', {}) or recalc_pressed:
     st.session_state.needs_recalc = True
     st.session_state.params = current_params
     st.session_state.is_animating = False # Stop animation if params change
+    # A job computing older parameters is superseded: cancel it
+    if st.session_state.job is not None:
+        st.session_state.job.cancel()
+        st.session_state.job = None
 
-# Perform recalculation if needed
-if st.session_state.needs_recalc:
-    with st.spinner("Generating graph and calculating PageRank..."):
-        # 1. Create Graph
-        st.session_state.graph = create_random_weighted_graph(num_nodes, edge_prob, graph_seed)
-        st.session_state.nodes_list = list(st.session_state.graph.nodes())
-        st.session_state.edges_list = list(st.session_state.graph.edges(data=True))
-
-        # 2. Calculate Layout
-        st.session_state.pos = calculate_layout(st.session_state.graph, seed=graph_seed) if st.session_state.graph.number_of_nodes() > 0 else {}
+if graph_model == EDGE_LIST_FILE and uploaded_edges is None:
+    st.info("Upload an edge-list file in the sidebar to rank your own graph.")
+    st.stop()
 
-        # 3. Calculate PageRank History
-        if st.session_state.graph.number_of_nodes() > 0:
-             _, st.session_state.pagerank_history = pagerank_weighted_iterative(
-                 st.session_state.graph,
-                 alpha=alpha,
-                 max_iter=max_iter_calc, # Use calculation max_iter
-                 tol=tol,
-                 weight='weight'
-             )
+def run_pipeline(job, edge_bytes, edge_name, metrics_settings):
+    """Generate -> layout -> PageRank -> figure template, run as a BackgroundJob (no st.* calls here)."""
+    with metrics.local(**metrics_settings), metrics.profile(), metrics.timer('pipeline'):
+        return pipeline_stages(job, edge_bytes, edge_name)
+
+# Monte Carlo preview: walks per batch, and an upper bound if the exact solver takes very long
+MC_BATCH_SIZE = 20_000
+MC_MAX_WALKS = 5_000_000
+
+def run_estimate(job, graph, stop):
+    """Publishes a Monte Carlo top-k into the job after every batch of walks, until `stop` is set or the job cancelled."""
+    def publish(estimator):
+        if estimator.batches < 2: # Error bars need at least two batches
+            return not stop.is_set() and not job.cancelled
+        try:
+            job.report(estimate=estimator.top_k(top_k), estimate_walks=estimator.walks)
+        except JobCancelled:
+            return False
+        return not stop.is_set()
+    MonteCarloPageRank(graph, alpha=alpha, weight='weight', seed=graph_seed).run(
+        MC_MAX_WALKS, MC_BATCH_SIZE, callback=publish, stop=stop)
+
+def pipeline_stages(job, edge_bytes, edge_name):
+    # Each stage is cached on its own parameters plus its upstream ones,
+    # so e.g. changing alpha reuses the cached graph and layout
+    graph_params = {'graph_model': graph_model, 'num_nodes': num_nodes, 'graph_seed': graph_seed, **model_params}
+    pagerank_params = {'alpha': alpha, 'max_iter': max_iter_calc, 'tol': tol, 'top_k': top_k if top_k_stop else None}
+
+    # 1. Create Graph
+    job.report('graph')
+    def build_graph():
+        if graph_model == EDGE_LIST_FILE:
+            # Kept as an on-disk CSR (see disk_pipeline_stages). Its files are memory-mapped,
+            # and POSIX keeps them readable after the directory is removed
+            with tempfile.TemporaryDirectory(prefix='pagerank_graph_', ignore_cleanup_errors=True) as work_dir:
+                return load_edge_list_bytes(edge_bytes, edge_name, work_dir, cancel_check=job.check_cancelled)
+        return create_graph(graph_model, num_nodes, graph_seed, cancel_check=job.check_cancelled, **model_params)
+    graph = pipeline_cache.graph(graph_params, build_graph)
+    if isinstance(graph, DiskCSR):
+        return disk_pipeline_stages(job, graph, graph_params, pagerank_params)
+    nodes_list = list(graph.nodes())
+    edges_list = list(graph.edges(data=True))
+
+    # 2. Calculate Layout
+    job.report('layout', graph=graph)
+    method = effective_layout(layout_method, graph.number_of_nodes()) # Also applies to uploaded edge lists
+    pos = pipeline_cache.layout(
+        graph_params, {'seed': graph_seed, 'method': method},
+        lambda: calculate_layout(graph, seed=graph_seed, method=method, cancel_check=job.check_cancelled)
+        if graph.number_of_nodes() > 0 else {})
+
+    # 3. Calculate PageRank History, streaming iterations into the job
+    preview = FigureTemplate(graph, pos, nodes_list, edges_list, max_nodes=max_render_nodes,
+                             max_edges=max_render_edges, render_mode=render_mode) if pos else None
+    job.report('pagerank', pos=pos, nodes_list=nodes_list, edges_list=edges_list, template=preview)
+    if graph.number_of_nodes() > 0:
+        stop_estimate = threading.Event()
+        # Walks only end when alpha < 1, so there is no preview at alpha = 1
+        if mc_preview and alpha < 1.0 and not pipeline_cache.has_pagerank(graph_params, pagerank_params):
+            job.submit(run_estimate, graph, stop_estimate)
+        try:
+            history = pipeline_cache.pagerank(
+                graph_params, pagerank_params,
+                lambda: pagerank_weighted_iterative(
+                    graph,
+                    alpha=alpha,
+                    max_iter=max_iter_calc, # Use calculation max_iter
+                    tol=tol,
+                    weight='weight',
+                    history_dtype='float32', # Compact history: scores only need display precision
+                    top_k=pagerank_params['top_k'],
+                    callback=job.pagerank_callback()
+                )[1])
+        finally:
+            stop_estimate.set()
+    else:
+        history = [{}]
+
+    # 4. Precompute static figure parts (edges, coordinates, degrees) once
+    job.report('figure')
+    template = FigureTemplate(
+        graph, pos, nodes_list, edges_list,
+        lod_scores=history[-1], # Level of detail picks the final top nodes
+        max_nodes=max_render_nodes, max_edges=max_render_edges, render_mode=render_mode
+    ) if pos else None
+
+    return {'graph': graph, 'pos': pos, 'nodes_list': nodes_list, 'edges_list': edges_list,
+            'pagerank_history': history, 'figure_template': template}
+
+def disk_pipeline_stages(job, csr, graph_params, pagerank_params):
+    """Uploaded edge lists: PageRank runs out-of-core, and only the nodes that are plotted are loaded."""
+    # 2. PageRank first, since its scores pick the nodes to plot
+    # (no Monte Carlo preview or top-k stop: both need the graph in memory)
+    job.report('pagerank')
+    if csr.num_nodes == 0:
+        history = [{}]
+    else:
+        history = pipeline_cache.pagerank(
+            graph_params, pagerank_params,
+            lambda: pagerank_weighted_iterative(
+                csr,
+                alpha=alpha,
+                max_iter=max_iter_calc,
+                tol=tol,
+                history_dtype='float32', # Only the final scores are recorded for an on-disk graph
+                callback=job.pagerank_callback()
+            )[1])
+
+    # 3. Load the top-ranked nodes plus a score-weighted sample, with the edges among them, and lay them out
+    job.report('figure')
+    visible = select_visible_nodes(history[-1].to_array(), max_nodes=max_render_nodes) if csr.num_nodes else []
+    graph = csr.subgraph(visible)
+    nodes_list = list(graph.nodes())
+    edges_list = list(graph.edges(data=True))
+    method = effective_layout(layout_method, graph.number_of_nodes())
+    pos = pipeline_cache.layout(
+        graph_params, {'seed': graph_seed, 'method': method, 'pagerank': pagerank_params, 'max_nodes': max_render_nodes},
+        lambda: calculate_layout(graph, seed=graph_seed, method=method, cancel_check=job.check_cancelled)
+        if graph.number_of_nodes() > 0 else {})
+    template = FigureTemplate(
+        graph, pos, nodes_list, edges_list, lod_scores=history[-1],
+        max_nodes=max_render_nodes, max_edges=max_render_edges, render_mode=render_mode
+    ) if pos else None
+
+    return {'graph': graph, 'pos': pos, 'nodes_list': nodes_list, 'edges_list': edges_list,
+            'pagerank_history': history, 'figure_template': template}
+
+def remove_temp_file(path):
+    """Deletes a temporary file; returns False if it is still in use (e.g. memory-mapped on Windows)."""
+    if path is None:
+        return True
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return False
+    return True
+
+# Open an uploaded bundle (once per file): it replaces the current results
+if uploaded_bundle is not None:
+    bundle_sha = hashlib.sha256(uploaded_bundle.getvalue()).hexdigest()
+    if st.session_state.get('loaded_bundle_sha') != bundle_sha:
+        # Written to disk so the history can be memory-mapped
+        fd, bundle_path = tempfile.mkstemp(suffix='.npz', prefix='pagerank_run_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(uploaded_bundle.getvalue())
+        try:
+            bundle = load_bundle(bundle_path)
+        except (ValueError, OSError, KeyError) as e:
+            remove_temp_file(bundle_path)
+            bundle_box.error(f"Could not open {uploaded_bundle.name}: {e}")
         else:
-            st.session_state.pagerank_history = [{}]
-
-        # 4. Reset iteration and flag
+            # The previous run's file is no longer needed; this one can often go right away
+            # (POSIX keeps an unlinked file readable while it is memory-mapped)
+            remove_temp_file(st.session_state.get('bundle_path'))
+            st.session_state.bundle_path = None if remove_temp_file(bundle_path) else bundle_path
+            if st.session_state.job is not None:
+                st.session_state.job.cancel()
+                st.session_state.job = None
+            st.session_state.graph = bundle.graph
+            st.session_state.pos = bundle.pos
+            st.session_state.pagerank_history = bundle.history
+            st.session_state.nodes_list = list(bundle.graph.nodes())
+            st.session_state.edges_list = list(bundle.graph.edges(data=True))
+            st.session_state.figure_template = FigureTemplate(
+                bundle.graph, bundle.pos, st.session_state.nodes_list, st.session_state.edges_list,
+                lod_scores=bundle.history[-1] if len(bundle.history) else None,
+                max_nodes=max_render_nodes, max_edges=max_render_edges, render_mode=render_mode
+            ) if bundle.pos else None
+            st.session_state.current_iteration = 0
+            st.session_state.needs_recalc = False
+            st.session_state.is_animating = False
+            st.session_state.job_error = None
+            st.session_state.loaded_bundle_sha = bundle_sha
+            st.session_state.params = current_params # Changing a setting recomputes as usual
+            bundle_box.success(f"Opened {uploaded_bundle.name}: {bundle.graph.number_of_nodes()} nodes, "
+                               f"{len(bundle.history)} iterations.")
+
+# Start a pipeline job if needed; it keeps running across reruns
+if st.session_state.needs_recalc and st.session_state.job is None:
+    st.session_state.job_error = None
+    st.session_state.job = BackgroundJob(
+        get_job_executor(), run_pipeline,
+        uploaded_edges.getvalue() if uploaded_edges else None, uploaded_edges.name if uploaded_edges else None,
+        metrics_settings, key=current_params)
+
+# Collect a finished job
+job = st.session_state.job
+if job is not None and job.done():
+    st.session_state.job = None
+    try:
+        result = job.result()
+    except JobCancelled:
+        pass
+    except Exception as e:
+        st.session_state.job_error = e
+        st.session_state.needs_recalc = False
+    else:
+        for name, value in result.items():
+            st.session_state[name] = value
+        # Reset iteration and flag
         st.session_state.current_iteration = 0
         st.session_state.needs_recalc = False
         st.session_state.is_animating = False # Ensure animation stops
 
+def bundle_builder(graph, pos, history, params):
+    """A download callable: serializes the run on the first click and keeps the bytes for later ones."""
+    built = []
+    def build():
+        if not built:
+            built.append(bundle_bytes(graph, pos or {}, history if hasattr(history, 'scores') else None, params))
+        return built[0]
+    return build
+
+# Offer the current results as a bundle (built only when downloaded, at most once per result)
+if not st.session_state.needs_recalc and st.session_state.graph is not None and st.session_state.job is None:
+    history = st.session_state.pagerank_history
+    if st.session_state.get('bundle_for') is not history:
+        st.session_state.bundle_data = bundle_builder(
+            st.session_state.graph, st.session_state.pos, history, st.session_state.params)
+        st.session_state.bundle_for = history
+    bundle_box.download_button("⬇️ Download Run (.npz)", st.session_state.bundle_data, file_name="pagerank_run.npz",
+                               mime="application/octet-stream", key="bundle_download")
+
 
 # --- Animation Controls (Sidebar) ---
 st.sidebar.markdown("---")
 st.sidebar.subheader("▶️ Animation")
+animation_mode = st.sidebar.radio(
+    "Animation Mode", ["In browser", "Server-side"], key="anim_mode_radio",
+    help="'In browser' sends all iterations once as Plotly frames and plays them client-side; 'Server-side' redraws the chart from the server at every step.")
 animation_speed = st.sidebar.slider("Animation Speed (sec/step)", 0.1, 2.0, 0.5, 0.1, key="anim_speed_slider", help="Pause between animation frames.")
 animate_pressed = st.sidebar.button("Run Animation", key="anim_button", disabled=st.session_state.needs_recalc or not st.session_state.pagerank_history)
 
@@ -108,7 +427,53 @@ st.title("🕸️ Interactive 3D PageRank Explorer")
 with st.expander("What is PageRank? Click to learn more...", expanded=False):
     st.markdown(explanation_content)
 
+JOB_STAGES = {'queued': "Waiting to start", 'graph': "Generating graph", 'layout': "Computing 3D layout",
+              'pagerank': "Calculating PageRank", 'figure': "Preparing figure"}
+
+@st.fragment(run_every=0.5)
+def show_job_progress():
+    """Polls the running job: progress, residual and the partial history drawn so far."""
+    job = st.session_state.job
+    if job is None or job.done():
+        st.rerun() # Pick up the result in a full rerun
+    stage_index = list(JOB_STAGES).index(job.stage)
+    if job.stage == 'pagerank' and max_iter_calc:
+        fraction = (stage_index + min(job.iteration / max_iter_calc, 1.0)) / len(JOB_STAGES)
+    else:
+        fraction = stage_index / len(JOB_STAGES)
+    status = f"{JOB_STAGES[job.stage]}... ({job.elapsed:.1f}s)"
+    if job.stage == 'pagerank' and job.residual is not None:
+        status += f" — iteration {job.iteration}, residual {job.residual:.2e}"
+    st.progress(fraction, text=status)
+
+    partial = dict(job.partial)
+    estimate_col, figure_col = st.columns([1, 3])
+    estimate = partial.get('estimate')
+    if estimate:
+        with estimate_col:
+            st.subheader("🎲 Quick Estimate")
+            estimate_df = pd.DataFrame([(node, score, 2 * se) for node, score, se in estimate],
+                                       columns=['Node', 'PageRank ≈', '±'])
+            estimate_df['Rank'] = estimate_df.index + 1
+            st.dataframe(estimate_df[['Rank', 'Node', 'PageRank ≈', '±']].set_index('Rank'), height=300)
+            st.caption(f"From {partial['estimate_walks']:,} random walks (± two standard errors); "
+                       f"refined until the exact result is ready.")
+    history = partial.get('history')
+    if history is not None and len(history) and partial.get('pos'):
+        current = len(history) - 1
+        fig = create_3d_figure(partial['graph'], partial['pos'], history[current], history.iterations[current],
+                               partial['nodes_list'], partial['edges_list'], alpha, template=partial.get('template'))
+        figure_col.plotly_chart(fig, use_container_width=True)
+
 # Check if data is ready before showing controls/plot
+if st.session_state.job is not None:
+    st.header("⏳ Computing...")
+    st.caption("Changing any setting cancels this run and starts a new one.")
+    show_job_progress()
+    st.stop()
+if st.session_state.job_error is not None:
+    st.error(f"Calculation failed: {st.session_state.job_error}")
+    st.stop()
 if st.session_state.needs_recalc or not st.session_state.pagerank_history or st.session_state.graph is None:
     st.warning("Please click '🔄 Generate Graph & Calculate PageRank' in the sidebar to start.")
     st.stop()
@@ -155,14 +520,24 @@ with control_col:
     iteration_metric_placeholder.metric("Current Iteration", f"{st.session_state.current_iteration} / {max_history_index}")
 
 
-    # Display Final Scores
+    # Display Final Scores (top-k by partial selection, no full sort)
     st.subheader("🏆 Final Scores")
     final_scores = st.session_state.pagerank_history[-1]
     if final_scores:
-        final_df = pd.DataFrame(list(final_scores.items()), columns=['Node', 'PageRank'])
-        final_df = final_df.sort_values(by='PageRank', ascending=False).reset_index(drop=True)
+        info = getattr(st.session_state.pagerank_history, 'info', {})
+        final_df = pd.DataFrame(top_k_scores(final_scores, top_k), columns=['Node', 'PageRank'])
         final_df['Rank'] = final_df.index + 1
-        st.dataframe(final_df[['Rank', 'Node', 'PageRank']].set_index('Rank'), height=300)
+        columns = ['Rank', 'Node', 'PageRank']
+        if 'top_k_certain' in info and len(info['top_k_certain']) == len(final_df):
+            final_df['Certain'] = info['top_k_certain']
+            columns.append('Certain')
+        st.dataframe(final_df[columns].set_index('Rank'), height=300)
+        if info.get('stopped_by') in ('stable', 'certified'):
+            reason = ("ranking unchanged for 3 iterations" if info['stopped_by'] == 'stable'
+                      else "every top-k gap exceeds the error bound")
+            st.caption(f"Stopped early after {info['iterations']} iterations ({reason}). "
+                       f"Confidence: {info['confidence']:.0%} of the top-{len(info['top_k'])} ranks are guaranteed "
+                       f"(error bound {info['error_bound']:.1e}).")
     else:
         st.write("No scores to display.")
 
@@ -171,8 +546,23 @@ with plot_col:
     st.subheader("Interactive 3D Graph")
     plot_placeholder = st.empty() # <-- Placeholder for the plot
 
-    # Animation Logic - runs ONLY when button is pressed
-    if animate_pressed:
+    # Client-side animation: one figure with a frame per iteration, played by the browser
+    if animate_pressed and animation_mode == "In browser":
+        fig = create_animated_figure(
+            st.session_state.graph,
+            st.session_state.pos,
+            st.session_state.pagerank_history,
+            st.session_state.nodes_list,
+            st.session_state.edges_list,
+            alpha,
+            frame_duration=animation_speed,
+            template=st.session_state.get('figure_template')
+        )
+        plot_placeholder.plotly_chart(fig, use_container_width=True)
+        iteration_metric_placeholder.metric("Current Iteration", f"0 / {max_history_index} (press ▶ Play on the chart)")
+
+    # Server-side animation Logic - runs ONLY when button is pressed
+    elif animate_pressed:
         st.session_state.is_animating = True
         # Start animation from iteration 0
         start_iter = 0
@@ -192,7 +582,8 @@ with plot_col:
                  i, # Pass the loop iterator 'i' as current_iter
                  st.session_state.nodes_list,
                  st.session_state.edges_list,
-                 alpha # Pass current alpha
+                 alpha, # Pass current alpha
+                 template=st.session_state.get('figure_template')
              )
              plot_placeholder.plotly_chart(fig, use_container_width=True)
 
@@ -218,7 +609,8 @@ with plot_col:
                 st.session_state.current_iteration,
                 st.session_state.nodes_list,
                 st.session_state.edges_list,
-                alpha
+                alpha,
+                template=st.session_state.get('figure_template')
             )
             plot_placeholder.plotly_chart(fig, use_container_width=True)
         else:
@@ -226,6 +618,47 @@ with plot_col:
             plot_placeholder.warning("Graph data not available or iteration index out of bounds.")
 
 
+# --- Performance Panel ---
+with st.expander("📈 Performance", expanded=False):
+    snapshot = metrics.snapshot() # Timers and counters of all sessions, this session's series
+    if not record_metrics and not snapshot['timers']:
+        st.write("Turn on 'Record metrics' under 📈 Performance in the sidebar, then recalculate.")
+    else:
+        if snapshot['timers']:
+            timer_df = pd.DataFrame([
+                {'Stage': name, 'Calls': t['count'], 'Total (ms)': t['total'] * 1000,
+                 'Mean (ms)': t['total'] * 1000 / t['count'], 'Max (ms)': t['max'] * 1000, 'Last (ms)': t['last'] * 1000}
+                for name, t in snapshot['timers'].items()
+            ]).sort_values('Total (ms)', ascending=False)
+            st.dataframe(timer_df.set_index('Stage'), use_container_width=True)
+        if snapshot['counters']:
+            st.dataframe(pd.Series(snapshot['counters'], name='Count').to_frame(), use_container_width=True)
+        iterations = snapshot['series'].get('pagerank.iterations')
+        if iterations:
+            iter_df = pd.DataFrame(iterations).set_index('iteration')
+            residual_col, time_col = st.columns(2)
+            residual_col.caption("L1 residual per iteration (last run)")
+            residual_col.line_chart(iter_df['residual'])
+            time_col.caption("Seconds per iteration (last run)")
+            time_col.line_chart(iter_df['seconds'])
+        if metrics.has_profile:
+            st.code(metrics.profile_text(limit=25))
+
+        export_cols = st.columns(3)
+        export_cols[0].download_button("⬇️ Metrics (JSON)", metrics.to_json(), file_name="pagerank_metrics.json",
+                                       mime="application/json", key="metrics_download")
+        if metrics.has_profile:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                profile_path = os.path.join(tmp_dir, 'profile.pstats')
+                metrics.dump_stats(profile_path)
+                with open(profile_path, 'rb') as f:
+                    profile_bytes = f.read()
+            export_cols[1].download_button("⬇️ Profile (pstats)", profile_bytes, file_name="pagerank_profile.pstats",
+                                           key="profile_download")
+        if export_cols[2].button("Reset Metrics", key="metrics_reset_button"):
+            metrics.reset()
+            st.rerun()
+
 # --- Footer ---
 st.markdown("---")
 st.caption("Built with Streamlit, NetworkX, and Plotly.")
\ No newline at end of file
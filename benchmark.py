@@ -0,0 +1,233 @@
+# benchmark.py
+"""
+Benchmark suite for the generate -> layout -> PageRank -> figure pipeline.
+
+Sweeps node count, density (average out-degree) and alpha, times every
+stage separately (best of --repeats), records each stage's peak Python/NumPy
+memory and the iterations to converge, and checks the scores against
+networkx.pagerank. Results are written as JSON; pass --compare with an
+earlier results file to flag stages that got slower.
+
+Usage:
+    python benchmark.py --nodes 100 1000 5000 --degrees 2 8 --alphas 0.85 0.95
+    python benchmark.py --output new.json --compare old.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+from graph_utils import calculate_layout, create_random_weighted_graph
+from pagerank_utils import pagerank_weighted_iterative
+from plot_utils import create_3d_figure
+
+RESULTS_VERSION = 1
+STAGES = ('generate', 'layout', 'pagerank', 'figure')
+
+
+def measure(func, repeats=3):
+    """
+    Runs func() `repeats` times untraced for timing, then once under tracemalloc.
+
+    Timing and memory are measured separately because tracemalloc slows down
+    Python-heavy code (e.g. building NetworkX graphs) considerably.
+
+    Returns:
+        tuple: (result of the last call, best wall time in seconds, peak traced bytes)
+    """
+    best = float('inf')
+    for _ in range(max(repeats, 1)):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(nodes=(100, 500, 2000), degrees=(3.0,), alphas=(0.85,), layout='spring',
+                   max_iter=100, tol=1.0e-6, repeats=3, seed=42, log=print):
+    """
+    Runs the sweep and returns the results document (see --output).
+
+    Graph and layout depend only on (nodes, degree), so they are timed once
+    per graph; PageRank, the figure and the NetworkX check run per alpha.
+
+    Args:
+        nodes (list): Node counts.
+        degrees (list): Average out-degrees (edge_prob = degree / (nodes - 1)).
+        alphas (list): Damping factors.
+        layout (str): Layout method for calculate_layout.
+        max_iter (int), tol (float): PageRank settings (also used for networkx).
+        repeats (int): Timed runs per stage (best is kept).
+        seed (int): Graph and layout seed.
+        log (callable): Progress output (None for silent).
+
+    Returns:
+        dict: {'version', 'meta', 'results'}; one result per (nodes, degree, alpha).
+    """
+    # Warm-up: the first figure build pays for Plotly's lazy imports
+    G = create_random_weighted_graph(10, 0.3, seed)
+    pos = calculate_layout(G, seed=seed, method=layout)
+    scores, _ = pagerank_weighted_iterative(G)
+    create_3d_figure(G, pos, scores, 0, list(G.nodes()), list(G.edges(data=True)), 0.85)
+
+    results = []
+    for num_nodes in nodes:
+        for degree in degrees:
+            edge_prob = min(degree / max(num_nodes - 1, 1), 1.0)
+            G, gen_time, gen_peak = measure(lambda: create_random_weighted_graph(num_nodes, edge_prob, seed), repeats)
+            pos, layout_time, layout_peak = measure(lambda: calculate_layout(G, seed=seed, method=layout), repeats)
+            nodes_list, edges_list = list(G.nodes()), list(G.edges(data=True))
+
+            for alpha in alphas:
+                (scores, history), pr_time, pr_peak = measure(
+                    lambda: pagerank_weighted_iterative(G, alpha=alpha, max_iter=max_iter, tol=tol), repeats)
+                _, fig_time, fig_peak = measure(
+                    lambda: create_3d_figure(G, pos, scores, len(history) - 1, nodes_list, edges_list, alpha), repeats)
+
+                # Reference check; networkx uses the same L1 stopping rule (err < N * tol)
+                start = time.perf_counter()
+                try:
+                    reference = nx.pagerank(G, alpha=alpha, max_iter=max_iter, tol=tol, weight='weight')
+                    max_error = max((abs(scores[n] - reference[n]) for n in G), default=0.0)
+                except nx.PowerIterationFailedConvergence:
+                    max_error = None
+                nx_time = time.perf_counter() - start
+
+                row = {
+                    'nodes': num_nodes,
+                    'degree': degree,
+                    'alpha': alpha,
+                    'edges': G.number_of_edges(),
+                    'stages': {
+                        'generate': {'time': gen_time, 'peak_bytes': gen_peak},
+                        'layout': {'time': layout_time, 'peak_bytes': layout_peak},
+                        'pagerank': {'time': pr_time, 'peak_bytes': pr_peak},
+                        'figure': {'time': fig_time, 'peak_bytes': fig_peak},
+                    },
+                    'iterations': history.info.get('iterations'),
+                    'converged': bool(history.info.get('converged')),
+                    'networkx_time': nx_time,
+                    'max_abs_error': max_error,
+                }
+                results.append(row)
+                if log:
+                    log(format_row(row))
+
+    meta = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'networkx': nx.__version__,
+        'platform': platform.platform(),
+        'layout': layout,
+        'max_iter': max_iter,
+        'tol': tol,
+        'repeats': repeats,
+        'seed': seed,
+    }
+    return {'version': RESULTS_VERSION, 'meta': meta, 'results': results}
+
+
+def format_row(row):
+    """One-line summary of a result row."""
+    stages = '  '.join(f"{s} {row['stages'][s]['time'] * 1000:8.1f}ms/{row['stages'][s]['peak_bytes'] / 1024 ** 2:6.1f}MB"
+                       for s in STAGES)
+    error = 'n/a' if row['max_abs_error'] is None else f"{row['max_abs_error']:.1e}"
+    return (f"N={row['nodes']:>6} deg={row['degree']:<4g} alpha={row['alpha']:<4g} E={row['edges']:>8}  {stages}  "
+            f"iters={row['iterations']} err={error}")
+
+
+def compare_results(old, new, threshold=1.25, min_time=0.005):
+    """
+    Compares two results documents stage by stage.
+
+    Args:
+        old, new (dict): Documents from run_benchmarks (matched on nodes, degree, alpha).
+        threshold (float): Time ratio (new / old) above which a stage counts as a regression.
+        min_time (float): Stages faster than this (seconds) in both runs are ignored as noise.
+
+    Returns:
+        list: Regression dicts with 'nodes', 'degree', 'alpha', 'stage', 'old', 'new' and 'ratio'.
+    """
+    def key(row):
+        return row['nodes'], row['degree'], row['alpha']
+
+    baseline = {key(row): row for row in old['results']}
+    regressions = []
+    for row in new['results']:
+        before = baseline.get(key(row))
+        if before is None:
+            continue
+        for stage in STAGES:
+            t_old = before['stages'][stage]['time']
+            t_new = row['stages'][stage]['time']
+            if max(t_old, t_new) < min_time or t_old <= 0:
+                continue
+            if t_new / t_old > threshold:
+                regressions.append({'nodes': row['nodes'], 'degree': row['degree'], 'alpha': row['alpha'],
+                                    'stage': stage, 'old': t_old, 'new': t_new, 'ratio': t_new / t_old})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark graph generation, layout, PageRank and figure building.")
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--degrees', type=float, nargs='+', default=[3.0],
+                        help="Average out-degrees (graph density)")
+    parser.add_argument('--alphas', type=float, nargs='+', default=[0.85])
+    parser.add_argument('--layout', default='spring', help="Layout method (spring, barnes_hut, spectral, multilevel)")
+    parser.add_argument('--max-iter', type=int, default=100)
+    parser.add_argument('--tol', type=float, default=1.0e-6)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', help="Earlier results file to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    document = run_benchmarks(args.nodes, args.degrees, args.alphas, args.layout, args.max_iter, args.tol,
+                              args.repeats, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Wrote {len(document['results'])} results to {args.output}")
+
+    failed = [row for row in document['results'] if row['max_abs_error'] is not None and row['max_abs_error'] > 10 * args.tol]
+    for row in failed:
+        print(f"Warning: scores differ from networkx.pagerank by {row['max_abs_error']:.2e} "
+              f"(N={row['nodes']}, degree={row['degree']}, alpha={row['alpha']})")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), document, args.threshold)
+        for r in regressions:
+            print(f"Regression: {r['stage']} at N={r['nodes']}, degree={r['degree']}, alpha={r['alpha']}: "
+                  f"{r['old'] * 1000:.1f}ms -> {r['new'] * 1000:.1f}ms ({r['ratio']:.2f}x)")
+        if not regressions:
+            print(f"No regressions against {args.compare}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# cache_utils.py
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+import networkx as nx
+
+from metrics_utils import metrics
+
+# Rough per-object costs of a NetworkX DiGraph (dicts of dicts), used for budgeting
+_GRAPH_BYTES_PER_NODE = 500
+_GRAPH_BYTES_PER_EDGE = 250
+
+
+def param_key(stage, params):
+    """Content-addressed cache key: a hash of the stage name and its parameters."""
+    payload = json.dumps({'stage': stage, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def estimate_nbytes(obj):
+    """Approximate memory footprint of a cached value, for the byte budget."""
+    if hasattr(obj, 'nbytes'): # numpy arrays, PageRankHistory
+        return int(obj.nbytes)
+    if isinstance(obj, nx.Graph):
+        return obj.number_of_nodes() * _GRAPH_BYTES_PER_NODE + obj.number_of_edges() * _GRAPH_BYTES_PER_EDGE
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a byte budget.
+
+    Entries are evicted least-recently-used first once the total estimated
+    size exceeds `max_bytes`. If `disk_dir` is set, evicted entries are
+    pickled there and transparently reloaded on a later miss.
+
+    Args:
+        max_bytes (int): Memory budget for cached values.
+        disk_dir (str, optional): Directory for spilled entries.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries = OrderedDict() # key -> (value, nbytes)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries or bool(self.disk_dir and os.path.exists(self._disk_path(key)))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            if self.disk_dir and os.path.exists(self._disk_path(key)):
+                with open(self._disk_path(key), 'rb') as f:
+                    value = pickle.load(f)
+                self.disk_hits += 1
+                self.put(key, value)
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value, nbytes=None):
+        nbytes = estimate_nbytes(value) if nbytes is None else nbytes
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, (value, nbytes) = self._entries.popitem(last=False)
+            self._bytes -= nbytes
+            if self.disk_dir and not os.path.exists(self._disk_path(key)):
+                tmp = self._disk_path(key) + '.tmp'
+                with open(tmp, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._disk_path(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class PipelineCache:
+    """
+    Layered cache for the generate -> layout -> PageRank pipeline.
+
+    Each stage is keyed by the hash of its own parameters plus those of the
+    stages it depends on, so changing only alpha/tol/max_iter reuses the
+    cached graph and layout, and changing only the layout seed reuses the graph.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2, disk_dir=None):
+        self.store = LRUCache(max_bytes=max_bytes, disk_dir=disk_dir)
+
+    def get_or_compute(self, stage, params, compute):
+        """Returns the cached value for (stage, params), computing and storing it on a miss."""
+        key = param_key(stage, params)
+        value = self.store.get(key)
+        if value is None:
+            metrics.increment(f'cache.{stage}.misses')
+            with metrics.timer(f'cache.{stage}.compute'):
+                value = compute()
+            self.store.put(key, value)
+        else:
+            metrics.increment(f'cache.{stage}.hits')
+        return value
+
+    def graph(self, graph_params, compute):
+        return self.get_or_compute('graph', graph_params, compute)
+
+    def layout(self, graph_params, layout_params, compute):
+        return self.get_or_compute('layout', {'graph': graph_params, **layout_params}, compute)
+
+    def pagerank(self, graph_params, pagerank_params, compute):
+        return self.get_or_compute('pagerank', {'graph': graph_params, **pagerank_params}, compute)
+
+    def has_pagerank(self, graph_params, pagerank_params):
+        """Whether pagerank() would be a cache hit (in memory or on disk)."""
+        return param_key('pagerank', {'graph': graph_params, **pagerank_params}) in self.store
+
+    def stats(self):
+        return {
+            'entries': len(self.store),
+            'bytes': self.store.nbytes,
+            'hits': self.store.hits,
+            'disk_hits': self.store.disk_hits,
+            'misses': self.store.misses,
+        }
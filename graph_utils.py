@@ -1,53 +1,377 @@
 # graph_utils.py
+from typing import NamedTuple
+
 import networkx as nx
-import random
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
 
-def create_random_weighted_graph(num_nodes, edge_prob=0.15, seed=None):
-    """Creates a random weighted directed graph."""
-    if seed is not None:
-        random.seed(seed)
-        np.random.seed(seed)
+from metrics_utils import metrics
+
+class EdgeList(NamedTuple):
+    """Array-backed directed edge list: node ids are 0..num_nodes-1."""
+    num_nodes: int
+    src: np.ndarray
+    dst: np.ndarray
+    weight: np.ndarray
+
+    @property
+    def num_edges(self):
+        return len(self.src)
+
+    def to_csr(self):
+        """Adjacency matrix in CSR form, A[u, v] = weight of edge u -> v."""
+        return edges_to_csr(self)
+
+    def to_digraph(self):
+        """NetworkX DiGraph with a 'weight' attribute per edge."""
+        return edges_to_digraph(self)
+
+
+def _sample_slots(rng, num_slots, prob, cancel_check=None):
+    """
+    Returns the sorted indices of a Bernoulli(prob) subset of range(num_slots).
+
+    Instead of drawing one random number per slot, the gaps between
+    successive hits are drawn from a geometric distribution, so the work is
+    O(hits) instead of O(num_slots). cancel_check is called between batches.
+    """
+    if num_slots == 0 or prob <= 0:
+        return np.empty(0, dtype=np.int64)
+    if prob >= 1:
+        return np.arange(num_slots, dtype=np.int64)
+    chunks = []
+    pos = -1
+    expected = num_slots * prob
+    batch = int(expected + 5 * np.sqrt(expected) + 16)
+    while pos < num_slots:
+        if cancel_check is not None:
+            cancel_check()
+        gaps = rng.geometric(prob, size=batch)
+        chunk = pos + np.cumsum(gaps, dtype=np.int64)
+        chunks.append(chunk)
+        pos = chunk[-1]
+    k = np.concatenate(chunks)
+    return k[k < num_slots]
+
+
+def _sample_pairs(rng, num_nodes, edge_prob, cancel_check=None):
+    """Samples G(n, p) directed edges (no self-loops) with geometric skipping."""
+    if num_nodes < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    k = _sample_slots(rng, num_nodes * (num_nodes - 1), edge_prob, cancel_check)
+    # Map the linear slot index back to an (i, j) pair, skipping the diagonal
+    src = k // (num_nodes - 1)
+    dst = k % (num_nodes - 1)
+    dst += dst >= src
+    return src, dst
 
-    G = nx.DiGraph()
-    if num_nodes <= 0:
-        return G # Return empty graph if num_nodes is invalid
 
-    nodes = list(range(num_nodes))
-    G.add_nodes_from(nodes)
+def _dedupe(num_nodes, src, dst):
+    """Drops self-loops and repeated (src, dst) pairs."""
+    keep = src != dst
+    key = np.unique(src[keep] * num_nodes + dst[keep])
+    return key // num_nodes, key % num_nodes
 
-    max_weight = 10 # Max random weight for an edge
 
-    for i in nodes:
-        for j in nodes:
-            if i != j and random.random() < edge_prob:
-                weight = random.randint(1, max_weight)
-                G.add_edge(i, j, weight=weight)
+def _weak_components(num_nodes, src, dst):
+    """(number of weakly connected components, component label per node)"""
+    adj = sp.csr_array((np.ones(len(src), dtype=np.int8), (src, dst)), shape=(num_nodes, num_nodes))
+    return connected_components(adj, directed=True, connection='weak')
+
+
+def _finish_edges(rng, num_nodes, src, dst, max_weight, connect=True):
+    """
+    Draws integer weights in [1, max_weight] and, if requested, patches
+    connectivity with as few edges as possible: one random node is picked
+    per weakly connected component, and these representatives are chained in
+    random order by edges of random direction (components - 1 new edges).
+    """
+    weight = rng.integers(1, max_weight + 1, size=len(src))
 
     # Ensure graph is not entirely disconnected (optional, but good for demo)
-    if num_nodes > 1 and not nx.is_weakly_connected(G):
-         # Add a few edges to try and connect components if needed
-         for i in range(num_nodes - 1):
-             if not G.has_edge(i, i + 1) and not G.has_edge(i+1, i):
-                 weight = random.randint(1, max_weight)
-                 if random.random() > 0.5:
-                    G.add_edge(i, i + 1, weight=weight)
-                 else:
-                    G.add_edge(i+1, i, weight=weight)
+    if connect and num_nodes > 1:
+        n_components, labels = _weak_components(num_nodes, src, dst)
+        if n_components > 1:
+            order = rng.permutation(num_nodes)
+            _, first = np.unique(labels[order], return_index=True)
+            reps = rng.permutation(order[first]) # One random node per component
+            u, v = reps[:-1], reps[1:]
+            forward = rng.random(len(u)) > 0.5
+            src = np.concatenate([src, np.where(forward, u, v)])
+            dst = np.concatenate([dst, np.where(forward, v, u)])
+            weight = np.concatenate([weight, rng.integers(1, max_weight + 1, size=len(u))])
+
+    return EdgeList(num_nodes, src, dst, weight)
+
+
+def random_weighted_edges(num_nodes, edge_prob=0.15, seed=None, max_weight=10, connect=True, cancel_check=None):
+    """
+    Creates a uniform (Erdős–Rényi) random weighted directed graph as an EdgeList.
+
+    Edges are sampled in bulk with geometric skipping, so generation is O(E).
+    cancel_check (callable, optional) is called between sampling batches; an
+    exception raised from it (e.g. JobCancelled) aborts the generation. The
+    other generators take it too.
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes = max(int(num_nodes), 0)
+    src, dst = _sample_pairs(rng, num_nodes, edge_prob, cancel_check)
+    return _finish_edges(rng, num_nodes, src, dst, max_weight, connect)
+
+
+# Sampling rounds rmat_edges runs to replace dropped edges before giving up
+RMAT_MAX_ROUNDS = 50
+
+def rmat_edges(num_nodes, avg_degree=8, a=0.57, b=0.19, c=0.19, seed=None,
+               max_weight=10, connect=True, chunk_size=1_000_000, cancel_check=None):
+    """
+    Creates a power-law R-MAT (recursive Kronecker) graph as an EdgeList.
+
+    Each edge descends log2(n) levels of the adjacency matrix, picking a
+    quadrant with probabilities (a, b, c, 1-a-b-c); all edges of a chunk
+    descend together, so there are no per-edge Python loops. Edges landing
+    outside num_nodes, self-loops and duplicates are dropped, and more edges
+    are drawn until num_nodes * avg_degree remain (capped at n * (n-1)).
+
+    Args:
+        num_nodes (int): Number of nodes.
+        avg_degree (float): Target number of edges per node.
+        a, b, c (float): Quadrant probabilities (top-left, top-right, bottom-left).
+        seed (int, optional): Random seed.
+        max_weight (int): Edge weights are drawn from [1, max_weight].
+        connect (bool): Patch weak connectivity like random_weighted_edges.
+        chunk_size (int): Edges generated per vectorized batch.
+        cancel_check (callable, optional): Called before every batch.
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes = max(int(num_nodes), 0)
+    if num_nodes < 2:
+        return _finish_edges(rng, num_nodes, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), max_weight, connect)
+
+    scale = int(np.ceil(np.log2(num_nodes)))
+    target = min(int(num_nodes * avg_degree), num_nodes * (num_nodes - 1))
+    cum = np.cumsum([a, b, c])
+    keys = np.empty(0, dtype=np.int64) # src * num_nodes + dst of the distinct edges so far, in draw order
+    kept_fraction = 1.0
+    for _ in range(RMAT_MAX_ROUNDS):
+        missing = target - len(keys)
+        if missing <= 0:
+            break
+        # Draw enough to cover what the previous round lost to self-loops, duplicates and range
+        draw = int(missing / max(kept_fraction, 0.01)) + 1
+        chunks = [keys]
+        for start in range(0, draw, chunk_size):
+            if cancel_check is not None:
+                cancel_check()
+            m = min(chunk_size, draw - start)
+            src = np.zeros(m, dtype=np.int64)
+            dst = np.zeros(m, dtype=np.int64)
+            for level in range(scale):
+                quadrant = np.searchsorted(cum, rng.random(m), side='right') # 0..3
+                src |= (quadrant >> 1) << level
+                dst |= (quadrant & 1) << level
+            keep = (src < num_nodes) & (dst < num_nodes) & (src != dst)
+            chunks.append(src[keep] * num_nodes + dst[keep])
+        found = len(keys)
+        keys = np.concatenate(chunks)
+        _, first = np.unique(keys, return_index=True)
+        keys = keys[np.sort(first)] # Distinct edges, keeping the earlier draws
+        kept_fraction = (len(keys) - found) / draw
+    else:
+        if len(keys) < target:
+            print(f"Warning: R-MAT produced only {len(keys)} of {target} distinct edges.")
+    keys = keys[:target]
+    return _finish_edges(rng, num_nodes, keys // num_nodes, keys % num_nodes, max_weight, connect)
+
+
+def barabasi_albert_edges(num_nodes, m=3, seed=None, max_weight=10, connect=True, cancel_check=None):
+    """
+    Creates a Barabási–Albert preferential-attachment graph as an EdgeList.
+
+    Uses the Batagelj–Brandes edge-list formulation: every new link of node v
+    copies the endpoint found at a uniformly random earlier slot of the edge
+    array, which picks targets proportionally to degree. The dependency
+    between slots is resolved with vectorized pointer jumping instead of a
+    per-edge loop. Links point from the newer node to the older one.
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes = max(int(num_nodes), 0)
+    m = max(int(m), 1)
+    total = num_nodes * m
+    if num_nodes < 2:
+        return _finish_edges(rng, num_nodes, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), max_weight, connect)
 
+    # Slot 2t holds the source of edge t, slot 2t+1 copies slot r_t (r_t <= 2t)
+    t = np.arange(total, dtype=np.int64)
+    src = t // m
+    ref = (rng.random(total) * (2 * t + 1)).astype(np.int64)
+    # Follow references until they land on an even (source) slot
+    odd = np.flatnonzero(ref & 1)
+    while len(odd):
+        if cancel_check is not None:
+            cancel_check()
+        ref[odd] = ref[ref[odd] >> 1]
+        odd = odd[ref[odd] & 1 == 1]
+    dst = ref >> 1
+    dst = src[dst] # slot 2k -> source node of edge k
+    src, dst = _dedupe(num_nodes, src, dst)
+    return _finish_edges(rng, num_nodes, src, dst, max_weight, connect)
 
-    # Basic check for empty graph after potential modifications
-    if G.number_of_nodes() == 0 and num_nodes > 0:
-        G.add_node(0) # Add at least one node if it became empty
 
+def stochastic_block_edges(sizes, p_in=0.2, p_out=0.01, seed=None, max_weight=10, connect=True, cancel_check=None):
+    """
+    Creates a stochastic block model graph as an EdgeList.
 
+    Nodes are split into consecutive blocks of the given sizes; each directed
+    pair is linked with probability p_in inside a block and p_out across
+    blocks. Every block pair is sampled with geometric skipping, so the cost
+    is O(E) rather than O(N^2).
+
+    Args:
+        sizes (list): Number of nodes in each block.
+        p_in (float or list): Within-block probability (or a full k x k matrix
+            of probabilities when p_out is None).
+        p_out (float, optional): Between-block probability.
+    """
+    rng = np.random.default_rng(seed)
+    sizes = [int(s) for s in sizes]
+    k = len(sizes)
+    probs = np.asarray(p_in, dtype=np.float64) if p_out is None else np.where(np.eye(k, dtype=bool), p_in, p_out)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    num_nodes = int(offsets[-1])
+
+    srcs, dsts = [], []
+    for i in range(k):
+        for j in range(k):
+            ni, nj = sizes[i], sizes[j]
+            if i == j:
+                s, d = _sample_pairs(rng, ni, probs[i, j], cancel_check)
+            else:
+                slot = _sample_slots(rng, ni * nj, probs[i, j], cancel_check)
+                s, d = slot // nj, slot % nj
+            srcs.append(s + offsets[i])
+            dsts.append(d + offsets[j])
+    src = np.concatenate(srcs) if srcs else np.empty(0, dtype=np.int64)
+    dst = np.concatenate(dsts) if dsts else np.empty(0, dtype=np.int64)
+    return _finish_edges(rng, num_nodes, src, dst, max_weight, connect)
+
+
+def _sbm_from_params(num_nodes, num_blocks=4, p_in=0.2, p_out=0.01, seed=None, **kwargs):
+    """Splits num_nodes into num_blocks near-equal blocks for stochastic_block_edges."""
+    num_blocks = max(1, min(int(num_blocks), max(int(num_nodes), 1)))
+    sizes = [len(b) for b in np.array_split(np.arange(max(int(num_nodes), 0)), num_blocks)]
+    return stochastic_block_edges(sizes, p_in, p_out, seed=seed, **kwargs)
+
+
+# Model name -> generator(num_nodes, seed=..., **params) returning an EdgeList
+GRAPH_MODELS = {
+    'Erdős–Rényi': random_weighted_edges,
+    'Barabási–Albert': barabasi_albert_edges,
+    'R-MAT': rmat_edges,
+    'Stochastic Block': _sbm_from_params,
+}
+
+
+# Parameters that set each model's link probabilities (scaled together by limit_density)
+DENSITY_PARAMS = {
+    'Erdős–Rényi': ('edge_prob',),
+    'Stochastic Block': ('p_in', 'p_out'),
+}
+
+
+def expected_num_edges(model, num_nodes, **params):
+    """Expected number of edges of a GRAPH_MODELS graph, before components are connected."""
+    n = max(int(num_nodes), 0)
+    if model == 'Erdős–Rényi':
+        return params.get('edge_prob', 0.15) * n * (n - 1)
+    if model == 'Barabási–Albert':
+        return max(int(params.get('m', 3)), 1) * n
+    if model == 'R-MAT':
+        return params.get('avg_degree', 8) * n
+    if model == 'Stochastic Block':
+        num_blocks = max(1, min(int(params.get('num_blocks', 4)), max(n, 1)))
+        sizes = np.array([len(b) for b in np.array_split(np.arange(n), num_blocks)], dtype=np.float64)
+        within = (sizes * (sizes - 1)).sum()
+        return params.get('p_in', 0.2) * within + params.get('p_out', 0.01) * (n * n - (sizes ** 2).sum())
+    raise ValueError(f"Unknown graph model: {model!r}. Choose from {list(GRAPH_MODELS)}")
+
+
+def limit_density(model, num_nodes, params, max_edges):
+    """
+    Scales a model's link probabilities down so that it expects at most
+    max_edges edges (other models and parameters are returned unchanged).
+
+    Returns:
+        dict: The parameters to generate with.
+    """
+    expected = expected_num_edges(model, num_nodes, **params)
+    keys = [k for k in DENSITY_PARAMS.get(model, ()) if k in params]
+    if expected <= max_edges or not keys:
+        return params
+    scale = max_edges / expected
+    return {**params, **{k: params[k] * scale for k in keys}}
+
+
+@metrics.timed('graph.generate_edges')
+def generate_edges(model, num_nodes, seed=None, **params):
+    """Generates an EdgeList with one of the GRAPH_MODELS."""
+    if model not in GRAPH_MODELS:
+        raise ValueError(f"Unknown graph model: {model!r}. Choose from {list(GRAPH_MODELS)}")
+    return GRAPH_MODELS[model](num_nodes, seed=seed, **params)
+
+
+def edges_to_csr(edges):
+    """Converts an EdgeList into a CSR adjacency matrix (duplicate edges are summed)."""
+    n = edges.num_nodes
+    A = sp.csr_array((edges.weight, (edges.src, edges.dst)), shape=(n, n))
+    A.sum_duplicates()
+    return A
+
+
+@metrics.timed('graph.to_digraph')
+def edges_to_digraph(edges):
+    """Adapter: builds a NetworkX DiGraph from an EdgeList for the existing code."""
+    G = nx.DiGraph()
+    G.add_nodes_from(range(edges.num_nodes))
+    G.add_weighted_edges_from(zip(edges.src.tolist(), edges.dst.tolist(), edges.weight.tolist()))
     return G
 
-def calculate_layout(G, seed=None):
-    """Calculates a 3D spring layout for the graph."""
+
+def create_random_weighted_graph(num_nodes, edge_prob=0.15, seed=None):
+    """Creates a random weighted directed graph."""
+    if num_nodes <= 0:
+        return nx.DiGraph() # Return empty graph if num_nodes is invalid
+    return edges_to_digraph(random_weighted_edges(num_nodes, edge_prob, seed))
+
+
+def create_graph(model, num_nodes, seed=None, **params):
+    """Creates a DiGraph with one of the GRAPH_MODELS (see generate_edges)."""
+    if num_nodes <= 0:
+        return nx.DiGraph()
+    return edges_to_digraph(generate_edges(model, num_nodes, seed=seed, **params))
+
+@metrics.timed('layout')
+def calculate_layout(G, seed=None, method='spring', cancel_check=None):
+    """
+    Calculates a 3D layout for the graph as a {node: (x, y, z)} dict.
+
+    method='spring' uses nx.spring_layout (O(N^2) per iteration); the
+    scalable modes of layout_utils ('barnes_hut', 'spectral', 'multilevel')
+    are better beyond a few thousand nodes. Those call cancel_check after
+    every iteration (an exception raised from it aborts the layout); the
+    spring layout only calls it before starting.
+    """
     if not G: # Handle empty graph
         return {}
 
+    if method != 'spring':
+        from layout_utils import layout_array # Local import: layout_utils depends on graph_utils
+        pos, nodes = layout_array(G, method=method, seed=seed, cancel_check=cancel_check)
+        return dict(zip(nodes, pos))
+    if cancel_check is not None:
+        cancel_check()
+
     if seed is not None:
         np.random.seed(seed)
 
@@ -0,0 +1,205 @@
+# history_utils.py
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class ScoreView(Mapping):
+    """Read-only {node: score} view over one row of a PageRankHistory."""
+
+    def __init__(self, row, nodes, index):
+        self._row = row
+        self._nodes = nodes
+        self._index = index
+
+    def __getitem__(self, node):
+        return float(self._row[self._index[node]])
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def items(self):
+        # Faster than the Mapping default: one tolist() instead of N lookups
+        return zip(self._nodes, self._row.tolist())
+
+    def values(self):
+        return self._row.tolist()
+
+    @property
+    def nodes(self):
+        """Node labels in row order."""
+        return self._nodes
+
+    def to_array(self):
+        """Returns the underlying score row (no copy)."""
+        return self._row
+
+
+class _RangeIndex(Mapping):
+    """{node: column} for the nodes 0..n-1 of a range, without building a dict."""
+
+    def __init__(self, n):
+        self._n = n
+
+    def __getitem__(self, node):
+        if isinstance(node, (int, np.integer)) and not isinstance(node, bool) and 0 <= node < self._n:
+            return int(node)
+        raise KeyError(node)
+
+    def __iter__(self):
+        return iter(range(self._n))
+
+    def __len__(self):
+        return self._n
+
+
+class PageRankHistory:
+    """
+    Compact per-iteration PageRank history.
+
+    Scores are kept in one preallocated (iterations x nodes) array instead of
+    a list of dicts. Indexing returns a dict-like ScoreView, so code written
+    for `history[i].get(node)` / `history[-1].items()` keeps working.
+
+    Args:
+        nodes (list or range): Node labels in column order. A range(n) is kept
+            as is and indexed arithmetically (no per-node list or dict).
+        capacity (int): Number of rows to preallocate (grows if exceeded).
+        dtype: Storage dtype, e.g. np.float64 or np.float32 to halve memory.
+        stride (int, optional): Record only every `stride`-th iteration (plus
+            the last one); None records only the last one.
+        delta (float, optional): Skip an iteration if no score moved by more
+            than `delta` since the last recorded row.
+        on_append (callable, optional): Called as on_append(history, iteration,
+            scores) after every append, recorded or not (e.g. progress
+            reporting). Cleared by finalize() so the history stays picklable.
+    """
+
+    def __init__(self, nodes, capacity=101, dtype=np.float64, stride=1, delta=None, on_append=None):
+        if stride is not None and stride < 1:
+            raise ValueError("stride must be >= 1")
+        if isinstance(nodes, range) and nodes.start == 0 and nodes.step == 1:
+            self.nodes = nodes
+            self.index = _RangeIndex(len(nodes))
+        else:
+            self.nodes = list(nodes)
+            self.index = {n: i for i, n in enumerate(self.nodes)}
+        self.stride = stride
+        self.delta = delta
+        self._data = np.empty((max(capacity, 1), len(self.nodes)), dtype=dtype)
+        self._iterations = np.empty(max(capacity, 1), dtype=np.int64)
+        self._size = 0
+        self._pending = None # Last skipped (iteration, vector), kept so finalize() can record it
+        self.info = {} # Solver report, filled in by pagerank_weighted_iterative
+        self.on_append = on_append
+
+    @classmethod
+    def from_arrays(cls, nodes, scores, iterations, info=None):
+        """
+        Wraps existing (rows x nodes) scores and their iteration numbers
+        without copying, e.g. memory-mapped arrays from a saved bundle.
+        Appending grows (copies) the arrays first.
+        """
+        history = cls(nodes, capacity=1, dtype=scores.dtype)
+        if scores.shape != (len(iterations), len(history.nodes)):
+            raise ValueError(f"scores shape {scores.shape} does not match {len(iterations)} iterations "
+                             f"x {len(history.nodes)} nodes")
+        history._data = scores
+        history._iterations = iterations
+        history._size = len(iterations)
+        history.info = dict(info or {})
+        return history
+
+    # --- Recording ---
+    def _as_vector(self, scores):
+        if isinstance(scores, Mapping):
+            vec = np.zeros(len(self.nodes))
+            for n, v in scores.items():
+                i = self.index.get(n)
+                if i is not None:
+                    vec[i] = v
+            return vec
+        return np.asarray(scores)
+
+    def _store(self, iteration, vec):
+        if self._size == self._data.shape[0]:
+            grow = max(self._size, 1)
+            self._data = np.concatenate([self._data, np.empty((grow, self._data.shape[1]), dtype=self._data.dtype)])
+            self._iterations = np.concatenate([self._iterations, np.empty(grow, dtype=np.int64)])
+        self._data[self._size] = vec
+        self._iterations[self._size] = iteration
+        self._size += 1
+        self._pending = None
+
+    def append(self, scores, iteration=None):
+        """
+        Records the scores of one iteration (array in node order or dict).
+
+        Returns:
+            bool: True if the row was stored, False if skipped by stride/delta.
+        """
+        if iteration is None:
+            iteration = int(self._iterations[self._size - 1]) + 1 if self._size else 0
+        vec = self._as_vector(scores)
+        if self._size or self.stride is None:
+            skip = self.stride is None or iteration % self.stride != 0
+            if not skip and self.delta is not None:
+                skip = np.abs(vec - self._data[self._size - 1]).max() <= self.delta
+            if skip:
+                self._pending = (iteration, np.array(vec, copy=True))
+                self._notify(iteration, vec)
+                return False
+        self._store(iteration, vec)
+        self._notify(iteration, vec)
+        return True
+
+    def _notify(self, iteration, vec):
+        if self.on_append is not None:
+            self.on_append(self, iteration, vec)
+
+    def finalize(self):
+        """
+        Makes sure the most recent iteration is recorded even if it was skipped,
+        and releases the preallocated rows that were never used.
+        """
+        if self._pending is not None:
+            self._store(*self._pending)
+        if self._data.shape[0] > self._size:
+            self._data = self._data[:self._size].copy()
+            self._iterations = self._iterations[:self._size].copy()
+        self.on_append = None
+        return self
+
+    # --- Access ---
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("history index out of range")
+        return ScoreView(self._data[i], self.nodes, self.index)
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    @property
+    def scores(self):
+        """(recorded rows x nodes) array view of the stored scores."""
+        return self._data[:self._size]
+
+    @property
+    def iterations(self):
+        """Iteration number of each recorded row."""
+        return self._iterations[:self._size]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes + self._iterations.nbytes
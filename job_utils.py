@@ -0,0 +1,111 @@
+# job_utils.py
+import threading
+import time
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's function once the job has been cancelled."""
+
+
+class BackgroundJob:
+    """
+    A cancellable computation running on a background executor.
+
+    `fn` is called as fn(job, *args, **kwargs) on an executor thread and
+    reports progress through job.report(...), which also raises JobCancelled
+    once cancel() has been called. Progress fields are plain attributes, so
+    the UI thread can poll them while the job runs.
+
+    Args:
+        executor (concurrent.futures.Executor): Where the job runs.
+        fn (callable): The computation.
+        key (optional): What the job computes (e.g. its parameters), used to
+            tell whether a newer request supersedes it.
+
+    Attributes:
+        stage (str): Current pipeline stage ('queued' until the job starts).
+        iteration (int): Last reported iteration.
+        residual (float): Last reported residual.
+        partial (dict): Intermediate results published with report(), e.g.
+            the graph and a history that is still being filled in.
+    """
+
+    def __init__(self, executor, fn, *args, key=None, **kwargs):
+        self.key = key
+        self.stage = 'queued'
+        self.iteration = 0
+        self.residual = None
+        self.partial = {}
+        self.started = time.perf_counter()
+        self.finished = None
+        self._cancel_event = threading.Event()
+        self._executor = executor
+        self.future = executor.submit(self._run, fn, args, kwargs)
+
+    def _run(self, fn, args, kwargs):
+        try:
+            self.check_cancelled()
+            return fn(self, *args, **kwargs)
+        finally:
+            self.finished = time.perf_counter()
+
+    # --- Reporting (job thread) ---
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def report(self, stage=None, iteration=None, residual=None, **partial):
+        """Updates progress and publishes partial results; raises JobCancelled if cancelled."""
+        if stage is not None:
+            self.stage = stage
+        if iteration is not None:
+            self.iteration = iteration
+        if residual is not None:
+            self.residual = residual
+        self.partial.update(partial)
+        self.check_cancelled()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Runs a helper task of this job (e.g. a preview) on the job's executor,
+        as fn(job, *args, **kwargs). The task shares the job's cancel flag: it
+        is dropped if the job is cancelled before it starts, and should call
+        report() or check_cancelled() to stop once it has started.
+
+        Returns:
+            concurrent.futures.Future: The task's future.
+        """
+        return self._executor.submit(self._run_helper, fn, args, kwargs)
+
+    def _run_helper(self, fn, args, kwargs):
+        self.check_cancelled()
+        return fn(self, *args, **kwargs)
+
+    def pagerank_callback(self, stage='pagerank'):
+        """A callback for pagerank_weighted_iterative that streams iterations into this job."""
+        def callback(iteration, residual, history):
+            self.report(stage, iteration=iteration, residual=residual, history=history)
+        return callback
+
+    # --- Control (UI thread) ---
+    def cancel(self):
+        """Asks the job to stop at its next report(); a job still queued never starts."""
+        self._cancel_event.set()
+        self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        """Returns the job's result, re-raising its exception (JobCancelled if it was cancelled)."""
+        if self.future.cancelled():
+            raise JobCancelled()
+        return self.future.result()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
@@ -0,0 +1,338 @@
+# layout_utils.py
+import time
+
+import networkx as nx
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from scipy.sparse.csgraph import connected_components
+
+from graph_utils import EdgeList
+
+MAX_TREE_DEPTH = 10 # Octree levels; 10 bits per axis keeps Morton codes in 30 bits
+
+
+def undirected_adjacency(G, weight='weight'):
+    """
+    Symmetric weighted adjacency (CSR) used by all layout modes.
+
+    Returns:
+        tuple: (scipy.sparse.csr_array, list of nodes in row order)
+    """
+    if isinstance(G, EdgeList):
+        nodes = list(range(G.num_nodes))
+        A = G.to_csr().astype(np.float64)
+    else:
+        nodes = list(G)
+        A = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=weight, dtype=np.float64, format='csr')
+    A = (A + A.T).tocsr()
+    A.setdiag(0)
+    A.eliminate_zeros()
+    return A, nodes
+
+
+def _normalize_positions(pos):
+    """Centers positions and scales them into [-1, 1], like nx.spring_layout."""
+    pos = pos - pos.mean(axis=0)
+    scale = np.abs(pos).max()
+    return pos / scale if scale > 0 else pos
+
+
+# --- Barnes-Hut force-directed layout ---
+
+def _spread_bits(v):
+    """Inserts two zero bits between each of the low 10 bits of v (for 3D Morton codes)."""
+    v = v & 0x3FF
+    v = (v | (v << 16)) & 0x30000FF
+    v = (v | (v << 8)) & 0x300F00F
+    v = (v | (v << 4)) & 0x30C30C3
+    v = (v | (v << 2)) & 0x9249249
+    return v
+
+
+def _build_octree(pos, depth):
+    """
+    Builds a linear octree from Morton codes.
+
+    Returns:
+        tuple: (list of per-level (keys, mass, center of mass, body->cell), root span)
+    """
+    lo = pos.min(axis=0)
+    span = float((pos.max(axis=0) - lo).max()) or 1.0
+    cells = 1 << depth
+    q = np.clip(((pos - lo) / span * cells).astype(np.int64), 0, cells - 1)
+    code = (_spread_bits(q[:, 0]) << 2) | (_spread_bits(q[:, 1]) << 1) | _spread_bits(q[:, 2])
+
+    levels = []
+    for level in range(1, depth + 1):
+        keys, inv = np.unique(code >> (3 * (depth - level)), return_inverse=True)
+        mass = np.bincount(inv, minlength=len(keys)).astype(np.float64)
+        com = np.column_stack([np.bincount(inv, weights=pos[:, d], minlength=len(keys)) for d in range(3)])
+        levels.append((keys, mass, com / mass[:, None], inv))
+    return levels, span
+
+
+def _repulsive_forces(pos, k, theta, depth):
+    """
+    Fruchterman-Reingold repulsion (k^2 / d) approximated with Barnes-Hut.
+
+    The octree is traversed for all bodies at once: a frontier of
+    (body, cell) pairs is either accepted (cell far enough away, width/d <
+    theta, so its center of mass stands in for all its bodies) or replaced by
+    the pairs of that cell's children on the next level.
+    """
+    N = len(pos)
+    force = np.zeros_like(pos)
+    levels, span = _build_octree(pos, depth)
+    eps2 = (1e-3 * k) ** 2
+
+    keys, _, _, _ = levels[0]
+    body = np.repeat(np.arange(N), len(keys))
+    cell = np.tile(np.arange(len(keys)), N)
+    for li, (keys, mass, com, inv) in enumerate(levels):
+        if len(body) == 0:
+            break
+        own = inv[body] == cell
+        m = mass[cell]
+        c = com[cell]
+        last = li == len(levels) - 1
+        if last:
+            # Leaf cells shared with other bodies: use their center of mass without this body
+            m = m - own
+            with np.errstate(invalid='ignore', divide='ignore'):
+                c = np.where(own[:, None], (c * mass[cell][:, None] - pos[body]) / m[:, None], c)
+            accept = m > 0
+        diff = pos[body] - c
+        d2 = np.maximum((diff ** 2).sum(axis=1), eps2)
+        if not last:
+            width = span / (1 << (li + 1))
+            accept = ~own & (width * width < theta * theta * d2)
+
+        if accept.any():
+            contrib = diff[accept] * (k * k * m[accept] / d2[accept])[:, None]
+            for d in range(3):
+                force[:, d] += np.bincount(body[accept], weights=contrib[:, d], minlength=N)
+        if last:
+            break
+
+        # Open the remaining cells: their children are contiguous in the next level's sorted keys
+        body, cell = body[~accept], cell[~accept]
+        next_keys = levels[li + 1][0]
+        first = keys[cell] << 3
+        start = np.searchsorted(next_keys, first)
+        counts = np.searchsorted(next_keys, first + 8) - start
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        body = np.repeat(body, counts)
+        cell = np.repeat(start, counts) + offsets
+    return force
+
+
+def _attractive_forces(pos, A, k):
+    """Fruchterman-Reingold spring attraction (w * d^2 / k) along weighted edges."""
+    upper = sp.triu(A, k=1, format='coo')
+    i, j = upper.row, upper.col
+    w = upper.data / upper.data.mean() if upper.nnz else upper.data
+    diff = pos[i] - pos[j]
+    d = np.sqrt((diff ** 2).sum(axis=1))
+    pull = diff * (w * d / k)[:, None]
+    N = len(pos)
+    force = np.zeros_like(pos)
+    for dim in range(3):
+        force[:, dim] = np.bincount(j, weights=pull[:, dim], minlength=N) - np.bincount(i, weights=pull[:, dim], minlength=N)
+    return force
+
+
+def barnes_hut_layout(A, seed=None, iterations=50, theta=1.0, init_pos=None,
+                      temperature=0.1, gravity=0.05, cancel_check=None):
+    """
+    3D force-directed (Fruchterman-Reingold) layout with Barnes-Hut repulsion.
+
+    Repulsion is O(N log N) per iteration via an octree instead of the O(N^2)
+    all-pairs sum in nx.spring_layout.
+
+    Args:
+        A (scipy.sparse matrix): Symmetric weighted adjacency.
+        seed (int, optional): Seed for the initial positions.
+        iterations (int): Number of force iterations.
+        theta (float): Barnes-Hut opening angle (larger is faster, less accurate).
+        init_pos (np.ndarray, optional): N x 3 starting positions.
+        temperature (float): Initial maximum displacement per iteration.
+        gravity (float): Pull towards the origin, keeps components together.
+        cancel_check (callable, optional): Called before every iteration; an
+            exception raised from it (e.g. JobCancelled) aborts the layout.
+
+    Returns:
+        np.ndarray: N x 3 positions scaled into [-1, 1].
+    """
+    N = A.shape[0]
+    if N == 0:
+        return np.zeros((0, 3))
+    if init_pos is None:
+        pos = np.random.default_rng(seed).random((N, 3)) - 0.5
+    else:
+        pos = np.array(init_pos, dtype=np.float64)
+    if N == 1:
+        return np.zeros((1, 3))
+
+    k = 1.0 / np.cbrt(N) # Ideal edge length for a unit volume
+    depth = int(min(MAX_TREE_DEPTH, max(1, np.ceil(np.log(N) / np.log(8)) + 1)))
+    t = temperature
+    cooling = t / (iterations + 1)
+    for _ in range(iterations):
+        if cancel_check is not None:
+            cancel_check()
+        force = _repulsive_forces(pos, k, theta, depth) + _attractive_forces(pos, A, k) - gravity * k * k * N * pos
+        length = np.sqrt((force ** 2).sum(axis=1))
+        length[length == 0] = 1.0
+        pos += force * (np.minimum(length, t) / length)[:, None]
+        t -= cooling
+    return _normalize_positions(pos)
+
+
+# --- Spectral layout ---
+
+def spectral_layout(A, seed=None, regularization=0.01, cancel_check=None):
+    """
+    3D spectral layout from the leading non-trivial eigenvectors of the
+    normalized adjacency D^-1/2 A D^-1/2.
+
+    A small uniform term (regularized spectral embedding) keeps disconnected
+    graphs and isolated nodes well-posed; it is applied as a rank-one
+    operator so the matrix stays sparse. The eigensolver start vector is
+    drawn from `seed`, which makes the result deterministic. cancel_check
+    is called on every product of the iterative eigensolver.
+
+    Returns:
+        np.ndarray: N x 3 positions scaled into [-1, 1].
+    """
+    N = A.shape[0]
+    if N < 5: # Too small for the eigensolver; fall back to a force layout
+        return barnes_hut_layout(A, seed=seed, cancel_check=cancel_check)
+
+    tau = regularization * max(A.sum() / N, 1.0)
+    deg = np.asarray(A.sum(axis=1)).ravel() + tau
+    d_inv_sqrt = 1.0 / np.sqrt(deg)
+    S = sp.diags_array(d_inv_sqrt) @ A @ sp.diags_array(d_inv_sqrt)
+
+    def matvec(v):
+        if cancel_check is not None:
+            cancel_check()
+        v = np.asarray(v).ravel()
+        return S @ v + (tau / N) * d_inv_sqrt * (d_inv_sqrt @ v)
+
+    if N <= 500:
+        dense = S.toarray() + (tau / N) * np.outer(d_inv_sqrt, d_inv_sqrt)
+        _, vecs = np.linalg.eigh(dense)
+        vecs = vecs[:, ::-1][:, :4]
+    else:
+        op = spla.LinearOperator((N, N), matvec=matvec, dtype=np.float64)
+        v0 = np.random.default_rng(seed).random(N)
+        vals, vecs = spla.eigsh(op, k=4, which='LA', v0=v0)
+        vecs = vecs[:, np.argsort(vals)[::-1]]
+
+    # Drop the trivial leading eigenvector, undo the degree scaling, and fix sign ambiguity
+    pos = vecs[:, 1:4] * d_inv_sqrt[:, None]
+    pos *= np.where(pos[np.abs(pos).argmax(axis=0), range(3)] < 0, -1.0, 1.0)
+    return _normalize_positions(pos)
+
+
+# --- Multilevel layout ---
+
+def _coarsen(A):
+    """
+    One coarsening step: every node joins its heaviest neighbor's cluster.
+
+    Returns:
+        tuple: (coarse adjacency, fine node -> coarse node labels)
+    """
+    N = A.shape[0]
+    A = A.tocsr()
+    deg = np.diff(A.indptr)
+    heavy = np.arange(N)
+    has = deg > 0
+    if has.any():
+        rows = np.repeat(np.arange(N), deg)
+        order = np.lexsort((-A.data, rows)) # By row, heaviest edge first
+        heavy[has] = A.indices[order[A.indptr[:-1][has]]]
+    pointer = sp.csr_array((np.ones(N), (np.arange(N), heavy)), shape=(N, N))
+    n_coarse, labels = connected_components(pointer, directed=False)
+    P = sp.csr_array((np.ones(N), (np.arange(N), labels)), shape=(N, n_coarse))
+    coarse = (P.T @ A @ P).tocsr()
+    coarse.setdiag(0)
+    coarse.eliminate_zeros()
+    return coarse, labels
+
+
+def multilevel_layout(A, seed=None, coarsest=64, iterations=50, refine_iterations=15, cancel_check=None):
+    """
+    Multilevel (coarsen-and-refine) force-directed layout.
+
+    The graph is repeatedly coarsened by heavy-neighbor clustering, the
+    coarsest graph gets a full Barnes-Hut layout, and each finer level starts
+    from its cluster's position (plus a small seeded jitter) and only needs a
+    few low-temperature refinement iterations. cancel_check is called
+    after every coarsening step and layout iteration.
+
+    Returns:
+        np.ndarray: N x 3 positions scaled into [-1, 1].
+    """
+    rng = np.random.default_rng(seed)
+    graphs, mappings = [A], []
+    while graphs[-1].shape[0] > coarsest:
+        if cancel_check is not None:
+            cancel_check()
+        coarse, labels = _coarsen(graphs[-1])
+        if coarse.shape[0] > 0.9 * graphs[-1].shape[0]: # Not shrinking any more
+            break
+        graphs.append(coarse)
+        mappings.append(labels)
+
+    pos = barnes_hut_layout(graphs[-1], seed=seed, iterations=iterations, cancel_check=cancel_check)
+    for fine, labels in zip(reversed(graphs[:-1]), reversed(mappings)):
+        k = 1.0 / np.cbrt(fine.shape[0])
+        init = pos[labels] * 0.5 + rng.normal(scale=0.1 * k, size=(fine.shape[0], 3))
+        pos = barnes_hut_layout(fine, iterations=refine_iterations, init_pos=init, temperature=0.5 * k,
+                                cancel_check=cancel_check)
+    return pos
+
+
+LAYOUT_METHODS = {
+    'barnes_hut': barnes_hut_layout,
+    'spectral': spectral_layout,
+    'multilevel': multilevel_layout,
+}
+
+
+def layout_array(G, method='barnes_hut', seed=None, weight='weight', **kwargs):
+    """
+    Computes a 3D layout as an N x 3 array.
+
+    Args:
+        G (nx.DiGraph or EdgeList): The graph (edge directions are ignored).
+        method (str): One of LAYOUT_METHODS.
+        seed (int, optional): Seed, makes the layout deterministic.
+        **kwargs: Passed to the layout function, e.g. cancel_check.
+
+    Returns:
+        tuple: (np.ndarray N x 3 positions, list of nodes in row order)
+    """
+    if method not in LAYOUT_METHODS:
+        raise ValueError(f"Unknown layout method: {method!r}. Choose from {sorted(LAYOUT_METHODS)}")
+    A, nodes = undirected_adjacency(G, weight=weight)
+    return LAYOUT_METHODS[method](A, seed=seed, **kwargs), nodes
+
+
+def compare_layouts(G, seed=None, methods=None, weight='weight'):
+    """
+    Times each layout mode on the same graph.
+
+    Returns:
+        dict: method -> wall time in seconds.
+    """
+    A, _ = undirected_adjacency(G, weight=weight)
+    timings = {}
+    for method in methods or LAYOUT_METHODS:
+        start = time.perf_counter()
+        LAYOUT_METHODS[method](A, seed=seed)
+        timings[method] = time.perf_counter() - start
+    return timings
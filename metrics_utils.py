@@ -0,0 +1,236 @@
+# metrics_utils.py
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from collections import deque
+
+# Longest series kept per name (oldest entries are dropped)
+MAX_SERIES_LENGTH = 10_000
+# Most series kept in total (the oldest are dropped, e.g. those of ended app sessions)
+MAX_SERIES = 256
+
+
+class Metrics:
+    """
+    Process-wide instrumentation: stage timers, counters and per-step series.
+
+    Everything is a no-op while `enabled` is False, so the hooks can stay in
+    hot paths. Recording is thread-safe (the app runs the pipeline on a
+    background thread).
+
+    - timer(name) / timed(name): accumulate count, total, max and last time.
+    - increment(name): counters, e.g. cache hits and misses.
+    - append(name, **values): series of per-step records, e.g. one per
+      PageRank iteration with its residual and duration.
+    - profile(): optional cProfile capture, exported with dump_stats().
+
+    `enabled` and `profiling` are shared by all threads unless a thread sets
+    its own with use_local() / local(), e.g. one background job of one app
+    session. A thread's scope keeps its series apart from other scopes' ones.
+
+    Args:
+        enabled (bool): Start recording immediately.
+    """
+
+    def __init__(self, enabled=False):
+        self._enabled = enabled
+        self._profiling = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all timers, counters, series and profile data."""
+        with self._lock:
+            self.timers = {} # name -> {'count', 'total', 'max', 'last'}
+            self.counters = {}
+            self.series = {} # 'scope/name' (or name without a scope) -> deque of dicts
+            self._profile_stats = None
+
+    # --- Settings ---
+    @property
+    def enabled(self):
+        settings = getattr(self._local, 'settings', None)
+        return self._enabled if settings is None else settings['enabled']
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = value
+
+    @property
+    def profiling(self):
+        settings = getattr(self._local, 'settings', None)
+        return self._profiling if settings is None else settings['profiling']
+
+    @profiling.setter
+    def profiling(self, value):
+        self._profiling = value
+
+    def use_local(self, enabled, profiling=False, scope=None):
+        """
+        Sets `enabled` and `profiling` for the calling thread only, and files
+        its series under `scope` (e.g. an app session id).
+        """
+        self._local.settings = {'enabled': enabled, 'profiling': profiling, 'scope': scope}
+
+    def clear_local(self):
+        """Makes the calling thread use the shared settings again."""
+        self._local.settings = None
+
+    @contextlib.contextmanager
+    def local(self, enabled, profiling=False, scope=None):
+        """use_local() for the duration of a block."""
+        previous = getattr(self._local, 'settings', None)
+        self.use_local(enabled, profiling, scope)
+        try:
+            yield
+        finally:
+            self._local.settings = previous
+
+    def _series_prefix(self):
+        settings = getattr(self._local, 'settings', None)
+        scope = settings and settings['scope']
+        return f"{scope}/" if scope else ""
+
+    # --- Recording ---
+    def add_time(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            t = self.timers.get(name)
+            if t is None:
+                t = self.timers[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0}
+            t['count'] += 1
+            t['total'] += seconds
+            t['max'] = max(t['max'], seconds)
+            t['last'] = seconds
+
+    @contextlib.contextmanager
+    def _timing(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def timer(self, name):
+        """Context manager timing a block under `name`."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timing(name)
+
+    def timed(self, name):
+        """Decorator timing every call of a function under `name`."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._timing(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def append(self, name, **values):
+        """Adds one record to the series `name`."""
+        if not self.enabled:
+            return
+        key = self._series_prefix() + name
+        with self._lock:
+            if key not in self.series:
+                while len(self.series) >= MAX_SERIES:
+                    del self.series[next(iter(self.series))]
+                self.series[key] = deque(maxlen=MAX_SERIES_LENGTH)
+            self.series[key].append(values)
+
+    def clear_series(self, name):
+        """Starts the series `name` over (e.g. at the beginning of a new run)."""
+        with self._lock:
+            self.series.pop(self._series_prefix() + name, None)
+
+    # --- Profiling ---
+    @contextlib.contextmanager
+    def profile(self):
+        """
+        Runs the block under cProfile if `profiling` is on (and no other thread
+        is profiling); stats accumulate until reset().
+        """
+        if not (self.enabled and self.profiling) or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+            with self._lock:
+                if self._profile_stats is None:
+                    self._profile_stats = pstats.Stats(profiler)
+                else:
+                    self._profile_stats.add(profiler)
+        finally:
+            self._profile_lock.release()
+
+    @property
+    def has_profile(self):
+        return self._profile_stats is not None
+
+    def dump_stats(self, path):
+        """Writes the collected profile in pstats format (load with pstats.Stats(path))."""
+        if self._profile_stats is None:
+            raise ValueError("No profile data collected")
+        with self._lock:
+            self._profile_stats.dump_stats(path)
+
+    def profile_text(self, sort='cumulative', limit=30):
+        """The top `limit` profile entries as printed by pstats."""
+        if self._profile_stats is None:
+            return ""
+        out = io.StringIO()
+        with self._lock:
+            self._profile_stats.stream = out
+            self._profile_stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    # --- Export ---
+    def snapshot(self):
+        """
+        All metrics as plain dicts/lists (JSON-serializable). Only the series
+        of the calling thread's scope (or the unscoped ones) are included,
+        under their plain names.
+        """
+        prefix = self._series_prefix()
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'timers': {name: dict(t) for name, t in self.timers.items()},
+                'counters': dict(self.counters),
+                'series': {key[len(prefix):]: list(s) for key, s in self.series.items()
+                           if key.startswith(prefix) and (prefix or '/' not in key)},
+            }
+
+    def to_json(self, path=None, indent=2):
+        """Returns the snapshot as a JSON string, also writing it to `path` if given."""
+        text = json.dumps(self.snapshot(), indent=indent, default=float)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+
+# Shared instance used by the instrumented modules
+metrics = Metrics()
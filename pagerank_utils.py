@@ -1,14 +1,231 @@
 # pagerank_utils.py
+import time
+
 import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from graph_utils import EdgeList
+from history_utils import PageRankHistory
+from metrics_utils import metrics
+from parallel_utils import ParallelPowerIteration, default_workers
+from storage_utils import DiskCSR, pagerank_disk
+
+
+class TransitionMatrix:
+    """
+    Column-stochastic transition matrix of a weighted graph, built once.
+
+    `G` may be a NetworkX DiGraph or an array-backed EdgeList (nodes 0..n-1),
+    which skips the per-edge Python work entirely.
+
+    `matrix` is stored in CSR form with one row per *target* node, so that
+    `matrix @ x` spreads every node's score over its out-links in a single
+    sparse mat-vec. Rows of dangling nodes (zero outgoing weight) are empty;
+    their mass is redistributed separately using `dangling_mask`.
+
+    Attributes:
+        nodes (list): Node labels in index order.
+        index (dict): Node label -> integer index.
+        matrix (scipy.sparse.csr_array): N x N matrix, M[i, j] = w(j, i) / out_weight[j].
+        out_weight (np.ndarray): Total outgoing weight per node.
+        dangling_mask (np.ndarray): Boolean mask of dangling nodes.
+    """
+
+    def __init__(self, G, weight='weight'):
+        self.weight = weight
+        if isinstance(G, EdgeList):
+            self.nodes = list(range(G.num_nodes))
+            self.index = {n: n for n in self.nodes}
+            self._set_edges(G.src, G.dst, np.asarray(G.weight, dtype=np.float64), G.num_nodes)
+            return
+
+        self.nodes = list(G)
+        self.index = {n: i for i, n in enumerate(self.nodes)}
+        N = len(self.nodes)
+
+        # Gather edges as flat arrays (missing weights default to 1, as in G.out_degree)
+        src = np.fromiter((self.index[u] for u, v in G.edges()), dtype=np.int64, count=G.number_of_edges())
+        dst = np.fromiter((self.index[v] for u, v in G.edges()), dtype=np.int64, count=G.number_of_edges())
+        w = np.fromiter((d.get(weight, 1.0) for _, _, d in G.edges(data=True)), dtype=np.float64, count=G.number_of_edges())
+        self._set_edges(src, dst, w, N)
+
+    def _set_edges(self, src, dst, w, N):
+        """(Re)build the normalized matrix from edge arrays."""
+        self.out_weight = np.bincount(src, weights=w, minlength=N).astype(np.float64)
+        self.dangling_mask = self.out_weight == 0.0
+        inv_out = np.zeros(N)
+        np.divide(1.0, self.out_weight, out=inv_out, where=~self.dangling_mask)
+        self._matrix = sp.csr_array((w * inv_out[src], (dst, src)), shape=(N, N))
+        self._matrix.sum_duplicates()
+        self._by_source = None
+        self._raw_weights = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None: # Edge deltas only patch by_source; rebuild the rows on demand
+            self._matrix = self._by_source.tocsr()
+        return self._matrix
+
+    @property
+    def by_source(self):
+        """The same matrix in CSC form, for cheap access to one node's out-links (column)."""
+        return self.build_by_source()
+
+    def build_by_source(self):
+        """Builds the CSC copy if it does not exist yet and returns it."""
+        if self._by_source is None:
+            self._by_source = self.matrix.tocsc()
+        return self._by_source
+
+    def _edge_indices(self, edges, what):
+        try:
+            return (np.array([self.index[e[0]] for e in edges], dtype=np.int64),
+                    np.array([self.index[e[1]] for e in edges], dtype=np.int64))
+        except KeyError as exc:
+            raise ValueError(f"{what} edge refers to unknown node {exc.args[0]!r}") from None
+
+    def apply_edge_delta(self, added=(), removed=(), reweighted=()):
+        """
+        Updates the matrix for a small change in the edge set.
+
+        Only the columns (out-links) of the changed source nodes are rewritten,
+        together with their out_weight entries; the row-oriented `matrix` is
+        rebuilt lazily the next time it is used. Edges must connect existing
+        nodes. Adding an edge that already exists sets its weight, like
+        G.add_edge.
+
+        Args:
+            added (iterable): (u, v, weight) edges to add.
+            removed (iterable): (u, v) edges to remove.
+            reweighted (iterable): (u, v, weight) existing edges with a new weight.
+
+        Returns:
+            np.ndarray: Indices of the nodes whose out-links changed.
+        """
+        changes = [(list(added), 'Added'), (list(removed), 'Removed'), (list(reweighted), 'Reweighted')]
+        src, dst, new_w = [], [], []
+        for edges, what in changes:
+            u, v = self._edge_indices(edges, what)
+            src.append(u)
+            dst.append(v)
+            new_w.append(np.zeros(len(edges)) if what == 'Removed' else np.array([e[2] for e in edges], dtype=np.float64))
+        src, dst, new_w = np.concatenate(src), np.concatenate(dst), np.concatenate(new_w)
+        if len(src) == 0:
+            return src
+        must_exist = np.ones(len(src), dtype=bool)
+        must_exist[:len(changes[0][0])] = False
+
+        cols = self.by_source
+        indptr, indices = cols.indptr, cols.indices
+        if self._raw_weights is None:
+            # Raw weights of the CSC entries, kept so repeated deltas don't accumulate rounding
+            self._raw_weights = cols.data * np.repeat(self.out_weight, np.diff(indptr))
+        raw = self._raw_weights
+
+        # New out-links {target: raw weight} of every changed source
+        columns = {}
+        for u, v, w, check in zip(src.tolist(), dst.tolist(), new_w.tolist(), must_exist.tolist()):
+            col = columns.get(u)
+            if col is None:
+                lo, hi = indptr[u], indptr[u + 1]
+                col = columns[u] = dict(zip(indices[lo:hi].tolist(), raw[lo:hi].tolist()))
+            if check and col.get(v, 0.0) == 0.0:
+                raise ValueError("Cannot remove or reweight an edge that does not exist")
+            col[v] = w
+        changed = np.array(sorted(columns), dtype=np.int64)
+        new_cols = []
+        for u in changed.tolist():
+            targets = sorted(v for v, w in columns[u].items() if w != 0)
+            new_cols.append((np.array(targets, dtype=indices.dtype),
+                             np.array([columns[u][v] for v in targets], dtype=np.float64)))
+
+        out_w = np.array([w.sum() for _, w in new_cols])
+        self.out_weight[changed] = out_w
+        self.dangling_mask[changed] = out_w == 0.0
+        inv_out = np.zeros(len(changed))
+        np.divide(1.0, out_w, out=inv_out, where=out_w != 0.0)
+
+        if all(len(t) == indptr[u + 1] - indptr[u] for u, (t, _) in zip(changed.tolist(), new_cols)):
+            # Same number of out-links everywhere: overwrite the columns in place
+            for u, (t, w), inv in zip(changed.tolist(), new_cols, inv_out):
+                lo, hi = indptr[u], indptr[u + 1]
+                indices[lo:hi], raw[lo:hi], cols.data[lo:hi] = t, w, w * inv
+        else:
+            # Splice the new columns between the untouched stretches of the arrays
+            counts = np.diff(indptr)
+            counts[changed] = [len(t) for t, _ in new_cols]
+            new_indptr = np.zeros(len(indptr), dtype=np.int64)
+            np.cumsum(counts, out=new_indptr[1:])
+            parts_i, parts_w, parts_d = [], [], []
+            prev = 0
+            for u, (t, w), inv in zip(changed.tolist(), new_cols, inv_out):
+                lo, hi = indptr[prev], indptr[u]
+                parts_i += [indices[lo:hi], t]
+                parts_w += [raw[lo:hi], w]
+                parts_d += [cols.data[lo:hi], w * inv]
+                prev = u + 1
+            parts_i.append(indices[indptr[prev]:])
+            parts_w.append(raw[indptr[prev]:])
+            parts_d.append(cols.data[indptr[prev]:])
+            self._by_source = sp.csc_array((np.concatenate(parts_d), np.concatenate(parts_i), new_indptr),
+                                            shape=cols.shape)
+            self._raw_weights = np.concatenate(parts_w)
+        self._matrix = None
+        return changed
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def to_vector(self, scores, default=0.0):
+        """Converts a {node: value} dict into a vector in index order."""
+        vec = np.full(len(self.nodes), default, dtype=np.float64)
+        for n, v in scores.items():
+            i = self.index.get(n)
+            if i is not None:
+                vec[i] = v
+        return vec
+
+    def to_dict(self, vec):
+        """Converts a vector in index order back into a {node: value} dict."""
+        return dict(zip(self.nodes, vec.tolist()))
+
 
+def _new_history(nodes, max_iter, history_opts):
+    """A history sized for one run: every stride-th of max_iter iterations, plus the first and last."""
+    stride = history_opts['stride']
+    capacity = 1 if stride is None else max_iter // max(stride, 1) + 2
+    return PageRankHistory(nodes, capacity=capacity, **history_opts)
+
+
+def _normalized_vector(T, values, name, fallback):
+    """Normalizes an optional {node: value} dict into a vector (fallback if None or zero-sum)."""
+    if values is None:
+        return fallback
+    missing = set(T.nodes) - set(values)
+    if missing:
+        raise ValueError(f"{name} vector missing nodes: {missing}")
+    s = float(sum(values.values()))
+    if s == 0:
+        return fallback
+    return T.to_vector(values) / s
+
+
+@metrics.timed('pagerank.total')
 def pagerank_weighted_iterative(G, alpha=0.85, personalization=None,
                                 max_iter=100, tol=1.0e-6, weight='weight',
-                                dangling=None, initial_scores=None):
+                                dangling=None, initial_scores=None,
+                                engine='sparse', history_dtype=np.float64,
+                                history_stride='auto', history_delta=None,
+                                method='power', workers=None, callback=None,
+                                top_k=None, top_k_patience=3):
     """
     Calculate PageRank using power iteration for a weighted graph.
 
     Args:
-        G (nx.DiGraph): The graph.
+        G (nx.DiGraph, EdgeList or DiskCSR): The graph. A DiskCSR (see
+            storage_utils) is iterated out-of-core over memory-mapped row
+            blocks, and by default only its final scores are recorded.
         alpha (float): Damping factor.
         personalization (dict, optional): Personalization vector.
         max_iter (int): Maximum iterations.
@@ -16,14 +233,908 @@ def pagerank_weighted_iterative(G, alpha=0.85, personalization=None,
         weight (str): Edge attribute key for weights.
         dangling (dict, optional): Distribution for dangling nodes.
         initial_scores (dict, optional): Starting PageRank scores.
+        engine (str): 'sparse' (vectorized CSR mat-vec), 'parallel' (the
+            mat-vec split into row blocks across threads, power method only)
+            or 'dict' (reference pure-Python implementation).
+        history_dtype: Storage dtype of the history array (np.float32 halves memory).
+        history_stride (int, optional): Record only every n-th iteration (the
+            last one is always kept); None records only the last one. 'auto'
+            records every iteration, or only the last one for a DiskCSR.
+        history_delta (float, optional): Skip recording iterations where no score
+            moved by more than this amount.
+        method (str): Solver for the sparse engine, one of SOLVERS:
+            'power', 'gauss_seidel', 'aitken', 'quadratic' or 'adaptive'.
+            The alternatives need fewer iterations but do more work per
+            iteration, so whether one is faster than 'power' depends on the
+            graph; measure with compare_solvers.
+        workers (int, optional): Threads for the parallel engine (default: one per CPU).
+        callback (callable, optional): Called as callback(iteration, residual,
+            history) after every iteration (residual is the L1 change, NaN for
+            the initial vector). An exception raised from it aborts the run.
+        top_k (int, optional): Top-k early termination (sparse power method
+            only): also stop once the top_k ranking has not changed for
+            top_k_patience iterations, or once every gap between consecutive
+            top-k scores exceeds the remaining error bound.
+        top_k_patience (int): Iterations the top-k ranking must stay unchanged.
+
+    Returns:
+        tuple: (dict: final PageRank scores, PageRankHistory: scores per iteration)
+            `history.info` holds the solver report (method, iterations,
+            per-step residuals, converged flag, wall time). With top_k it
+            also has 'stopped_by' ('tol', 'certified', 'stable' or None),
+            'top_k' [(node, score), ...], 'top_k_certain' (per-rank flags),
+            'confidence' (fraction of certain ranks) and 'error_bound'.
+    """
+    if history_stride == 'auto':
+        history_stride = None if isinstance(G, DiskCSR) else 1
+    history_opts = dict(dtype=history_dtype, stride=history_stride, delta=history_delta,
+                        on_append=_progress_hook(callback))
+    if engine == 'dict':
+        if method != 'power':
+            raise ValueError("The 'dict' engine only supports method='power'")
+        if isinstance(G, EdgeList):
+            G = G.to_digraph()
+        return _pagerank_dict(G, alpha, personalization, max_iter, tol, weight, dangling, initial_scores, history_opts)
+    if engine not in ('sparse', 'parallel'):
+        raise ValueError(f"Unknown PageRank engine: {engine!r}")
+    if engine == 'parallel' and method != 'power':
+        raise ValueError("The 'parallel' engine only supports method='power'")
+    if top_k is not None and (engine != 'sparse' or method != 'power' or isinstance(G, DiskCSR)):
+        raise ValueError("top_k early termination needs engine='sparse' and method='power'")
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k must be >= 1")
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown PageRank method: {method!r}. Choose from {sorted(SOLVERS)}")
+    if isinstance(G, DiskCSR):
+        if method != 'power':
+            raise ValueError("Out-of-core PageRank only supports method='power'")
+        return _pagerank_on_disk(G, alpha, personalization, max_iter, tol, dangling, initial_scores, history_opts)
+
+    N = G.num_nodes if isinstance(G, EdgeList) else len(G)
+    if N == 0:
+        return {}, PageRankHistory([], **history_opts).finalize()
+
+    with metrics.timer('pagerank.transition_matrix'):
+        T = TransitionMatrix(G, weight=weight)
+    uniform = np.full(N, 1.0 / N)
+
+    # Initial vector
+    x = uniform.copy()
+    if initial_scores is not None:
+        s = float(sum(initial_scores.values()))
+        if s != 0: # Handle case where initial scores are all zero
+            x = T.to_vector(initial_scores) / s
+
+    history = _new_history(T.nodes, max_iter, history_opts)
+    history.append(x, iteration=0) # Store initial state
+
+    p = _normalized_vector(T, personalization, "Personalization", uniform)
+    dangling_weights = _normalized_vector(T, dangling, "Dangling", p)
+
+    start = time.perf_counter()
+    top_k_info = {}
+    if engine == 'parallel':
+        solver = ParallelPowerIteration(T.matrix, T.dangling_mask, workers=workers)
+        x, residuals, converged = solver.solve(x, alpha, p, dangling_weights, max_iter, tol, history)
+    elif top_k is not None:
+        x, residuals, stopped_by = _solve_top_k(T, x, alpha, p, dangling_weights, max_iter, tol, history,
+                                                top_k, top_k_patience)
+        converged = stopped_by is not None
+        top_k_info = _top_k_report(T, x, alpha, residuals, top_k)
+        top_k_info['stopped_by'] = stopped_by
+    else:
+        x, residuals, converged = SOLVERS[method](T, x, alpha, p, dangling_weights, max_iter, tol, history)
+    history.info = {
+        'method': method,
+        'iterations': len(residuals),
+        'residuals': np.asarray(residuals),
+        'converged': converged,
+        'wall_time': time.perf_counter() - start,
+        **top_k_info,
+    }
+    metrics.add_time(f"pagerank.solve.{'parallel' if engine == 'parallel' else method}", history.info['wall_time'])
+
+    if not converged:
+        print(f"Warning: PageRank did not converge within {max_iter} iterations.")
+        metrics.increment('pagerank.not_converged')
+
+    return T.to_dict(x), history.finalize()
+
+
+# --- Top-k ranking ---
+
+def top_k_indices(x, k):
+    """
+    Indices of the k largest entries of x, in descending order.
+
+    Uses a partial selection (np.argpartition, O(N)) and only sorts the k
+    selected entries; ties are broken by index so the order is deterministic.
+    """
+    x = np.asarray(x)
+    k = min(int(k), len(x))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    idx = np.argpartition(-x, k - 1)[:k] if k < len(x) else np.arange(len(x))
+    return idx[np.lexsort((idx, -x[idx]))]
+
+
+def top_k_scores(scores, k):
+    """
+    The k highest-scoring nodes as [(node, score), ...], best first.
+
+    Args:
+        scores: A ScoreView (history row) or a {node: score} dict.
+        k (int): Number of nodes.
+    """
+    if hasattr(scores, 'to_array'):
+        nodes, values = scores.nodes, scores.to_array()
+    else:
+        nodes = list(scores)
+        values = np.fromiter(scores.values(), dtype=np.float64, count=len(nodes))
+    return [(nodes[i], float(values[i])) for i in top_k_indices(values, k)]
+
+
+def _rank_certainty(ranked, k, bound):
+    """
+    Which of the top-k ranks are guaranteed, given scores `ranked` (the top
+    k+1 in descending order) that are each within an L1 error `bound` of the
+    limit. Two nodes cannot swap if their gap exceeds the bound, since the
+    sum of their errors is at most the L1 error.
+    """
+    gaps = np.append(ranked[:-1] - ranked[1:], np.inf)[:k] # Gap to the next rank (none after the last node)
+    separated = gaps > bound
+    return separated & np.append(True, separated[:-1])[:k]
+
+
+def _error_bound(alpha, residual):
+    """L1 distance of a power iterate from the fixed point: alpha / (1 - alpha) * last L1 change."""
+    return alpha / (1.0 - alpha) * residual if alpha < 1.0 else np.inf
+
+
+def _solve_top_k(T, x, alpha, p, d, max_iter, tol, history, k, patience):
+    """
+    Power iteration that also stops on a settled top-k ranking.
 
     Returns:
-        tuple: (dict: final PageRank scores, list: history of scores per iteration)
+        tuple: (x, list of L1 residuals, stopped_by) with stopped_by 'tol',
+            'certified' (all top-k gaps exceed the error bound), 'stable'
+            (ranking unchanged for `patience` iterations) or None.
     """
-    
+    N = len(T)
+    residuals = []
+    previous = None
+    unchanged = 0
+    for iteration in range(max_iter):
+        xlast = x
+        x = _power_step(T, xlast, alpha, p, d)
+        history.append(x, iteration=iteration + 1)
+
+        err = np.abs(x - xlast).sum()
+        residuals.append(err)
+        if err < N * tol:
+            return x, residuals, 'tol'
+
+        order = top_k_indices(x, k + 1)
+        if _rank_certainty(x[order], min(k, N), _error_bound(alpha, err)).all():
+            return x, residuals, 'certified'
+        ranking = order[:k]
+        unchanged = unchanged + 1 if previous is not None and np.array_equal(ranking, previous) else 0
+        previous = ranking
+        if unchanged >= patience:
+            return x, residuals, 'stable'
+    return x, residuals, None
+
+
+def _top_k_report(T, x, alpha, residuals, k):
+    """history.info entries describing the final top-k and how certain each rank is."""
+    bound = _error_bound(alpha, residuals[-1]) if residuals else np.inf
+    order = top_k_indices(x, k + 1)
+    certain = _rank_certainty(x[order], min(k, len(x)), bound)
+    return {
+        'top_k': [(T.nodes[i], float(x[i])) for i in order[:k]],
+        'top_k_certain': certain.tolist(),
+        'confidence': float(certain.mean()) if len(certain) else 1.0,
+        'error_bound': float(bound),
+    }
+
+
+def _progress_hook(callback):
+    """
+    Adapts a callback(iteration, residual, history) to PageRankHistory.on_append.
+
+    While metrics are enabled, every iteration's residual and duration is also
+    recorded in the 'pagerank.iterations' series (which restarts for each run).
+    """
+    if callback is None and not metrics.enabled:
+        return None
+    metrics.clear_series('pagerank.iterations')
+    last = [None, time.perf_counter()] # Previous vector, time of the previous append
+
+    def on_append(history, iteration, vec):
+        vec = np.asarray(vec, dtype=np.float64)
+        residual = float(np.abs(vec - last[0]).sum()) if last[0] is not None else float('nan')
+        now = time.perf_counter()
+        metrics.append('pagerank.iterations', iteration=int(iteration),
+                       residual=residual if last[0] is not None else None, seconds=now - last[1])
+        last[0], last[1] = vec.copy(), now
+        if callback is not None:
+            callback(iteration, residual, history)
+    return on_append
+
+
+# --- Solvers ---
+# Each solver takes (T, x0, alpha, p, d, max_iter, tol, history), records every
+# iterate into `history` and returns (x, list of L1 residuals, converged).
+
+def _power_step(T, x, alpha, p, d):
+    """One power-iteration step: x -> alpha*(M x + dangling mass * d) + (1-alpha)*p."""
+    danglesum = alpha * x[T.dangling_mask].sum()
+    return alpha * (T.matrix @ x) + danglesum * d + (1.0 - alpha) * p
+
+
+def _solve_power(T, x, alpha, p, d, max_iter, tol, history, extrapolate=None, every=10):
+    """
+    Plain power iteration, optionally applying `extrapolate` every `every` steps.
+
+    An extrapolated point is only kept if its own power-step residual is
+    smaller than that of the current iterate, so extrapolation never slows
+    convergence down. Each attempt costs one extra mat-vec.
+    """
+    N = len(T)
+    residuals = []
+    recent = [x] # Consecutive power iterates, for extrapolation
+    for iteration in range(max_iter):
+        xlast = x
+        x = _power_step(T, xlast, alpha, p, d)
+        recent = (recent + [x])[-4:]
+        if extrapolate is not None and (iteration + 1) % every == 0:
+            x_ext = extrapolate(recent)
+            if x_ext is not None:
+                x_ext_next = _power_step(T, x_ext, alpha, p, d)
+                if np.abs(x_ext_next - x_ext).sum() < np.abs(x - xlast).sum():
+                    # Continue one step past the extrapolated point, so the mat-vec isn't wasted
+                    xlast, x = x_ext, x_ext_next
+                    recent = [xlast, x] # Extrapolated point starts a new sequence
+
+        history.append(x, iteration=iteration + 1) # Store current iteration state
+
+        # Check convergence (L1 norm)
+        err = np.abs(x - xlast).sum()
+        residuals.append(err)
+        if err < N * tol:
+            return x, residuals, True
+    return x, residuals, False
+
+
+def _renormalize(x_ext, mass):
+    """Clips negative entries produced by extrapolation and restores total mass."""
+    x_ext = np.clip(x_ext, 0.0, None)
+    s = x_ext.sum()
+    return x_ext * (mass / s) if s > 0 else None
+
+
+def _aitken(recent):
+    """Component-wise Aitken delta-squared extrapolation from the last three iterates."""
+    if len(recent) < 3:
+        return None
+    x0, x1, x2 = recent[-3:]
+    g = x1 - x0
+    h = x2 - 2.0 * x1 + x0
+    safe = np.abs(h) > 1e-300
+    x_ext = x2.copy()
+    x_ext[safe] = x0[safe] - g[safe] ** 2 / h[safe]
+    return _renormalize(x_ext, x2.sum())
+
+
+def _quadratic(recent):
+    """Quadratic extrapolation (Kamvar et al.) from the last four iterates."""
+    if len(recent) < 4:
+        return None
+    x0, x1, x2, x3 = recent[-4:]
+    y1, y2, y3 = x1 - x0, x2 - x0, x3 - x0
+    # Least-squares fit of gamma1, gamma2 with gamma3 = 1
+    (g1, g2), *_ = np.linalg.lstsq(np.column_stack([y1, y2]), -y3, rcond=None)
+    b0, b1, b2 = g1 + g2 + 1.0, g2 + 1.0, 1.0
+    return _renormalize(b0 * x1 + b1 * x2 + b2 * x3, x3.sum())
+
+
+def _solve_aitken(T, x, alpha, p, d, max_iter, tol, history):
+    return _solve_power(T, x, alpha, p, d, max_iter, tol, history, extrapolate=_aitken)
+
+
+def _solve_quadratic(T, x, alpha, p, d, max_iter, tol, history):
+    return _solve_power(T, x, alpha, p, d, max_iter, tol, history, extrapolate=_quadratic)
+
+
+def _solve_gauss_seidel(T, x, alpha, p, d, max_iter, tol, history):
+    """
+    Gauss-Seidel sweeps on (I - alpha*M) x = alpha*dangling mass*d + (1-alpha)*p.
+
+    Each sweep is one sparse triangular solve, so updated scores are used
+    immediately within the sweep. The dangling term is lagged by one sweep.
+    A sweep costs about two power steps (the solve plus a mat-vec with the
+    upper part), so it only pays off when it needs well under half as many
+    iterations as power.
+    """
+    N = len(T)
+    A = sp.eye_array(N, format='csr') - alpha * T.matrix
+    upper = sp.triu(A, k=1, format='csr')
+    # Set up the triangular solve once: with the natural ordering and no pivoting
+    # SuperLU keeps the lower part as is (no fill-in), and every sweep is a plain
+    # forward substitution in C instead of a fresh spsolve_triangular call
+    lower = spla.splu(sp.tril(A, format='csc'), permc_spec='NATURAL', diag_pivot_thresh=0.0,
+                      options=dict(SymmetricMode=True))
+    teleport = (1.0 - alpha) * p
+    residuals = []
+    for iteration in range(max_iter):
+        xlast = x
+        rhs = alpha * xlast[T.dangling_mask].sum() * d + teleport - upper @ xlast
+        x = lower.solve(rhs)
+        s = x.sum()
+        if s > 0:
+            x = x / s
+
+        history.append(x, iteration=iteration + 1)
+
+        err = np.abs(x - xlast).sum()
+        residuals.append(err)
+        if err < N * tol:
+            return x, residuals, True
+    return x, residuals, False
+
+
+# The adaptive solver re-slices its rows once fewer than this fraction of them still move
+ADAPTIVE_RESLICE_FRACTION = 0.5
+
+def _solve_adaptive(T, x, alpha, p, d, max_iter, tol, history):
+    """
+    Adaptive PageRank (Kamvar et al.): nodes whose score changed by less than
+    tol/10 in a step are frozen and their rows are dropped from the mat-vec.
+
+    Slicing the rows out of the matrix costs about as much as a mat-vec, so
+    the rows are only re-sliced once the moving nodes drop below
+    ADAPTIVE_RESLICE_FRACTION of them; until then, the remaining rows keep
+    being updated. It only beats power iteration when most nodes converge
+    early.
+    """
+    N = len(T)
+    teleport = (1.0 - alpha) * p
+    active = np.arange(N) # Rows still in the mat-vec
+    rows = T.matrix
+    residuals = []
+    for iteration in range(max_iter):
+        xlast = x
+        danglesum = alpha * xlast[T.dangling_mask].sum()
+        x = xlast.copy()
+        x[active] = alpha * (rows @ xlast) + danglesum * d[active] + teleport[active]
+
+        history.append(x, iteration=iteration + 1)
+
+        delta = np.abs(x[active] - xlast[active])
+        err = delta.sum()
+        residuals.append(err)
+        if err < N * tol:
+            return x, residuals, True
+
+        still_moving = delta >= tol / 10
+        if np.count_nonzero(still_moving) < ADAPTIVE_RESLICE_FRACTION * len(active):
+            active = active[still_moving]
+            rows = T.matrix[active]
+    return x, residuals, False
+
+
+SOLVERS = {
+    'power': _solve_power,
+    'gauss_seidel': _solve_gauss_seidel,
+    'aitken': _solve_aitken,
+    'quadratic': _solve_quadratic,
+    'adaptive': _solve_adaptive,
+}
+
+
+def compare_solvers(G, methods=None, **kwargs):
+    """
+    Runs each solver on G and returns their reports, fastest first.
+
+    Args:
+        G (nx.DiGraph): The graph.
+        methods (list, optional): Solver names (defaults to all of SOLVERS).
+        **kwargs: Passed through to pagerank_weighted_iterative.
+
+    Returns:
+        list: history.info dicts, sorted by wall time.
+    """
+    reports = []
+    for method in methods or SOLVERS:
+        _, history = pagerank_weighted_iterative(G, method=method, **kwargs)
+        reports.append(history.info)
+    return sorted(reports, key=lambda r: r['wall_time'])
+
+
+def parallel_scaling(G, worker_counts=None, repeats=3, **kwargs):
+    """
+    Scaling benchmark for the parallel engine.
+
+    Runs PageRank on G with each worker count (best of `repeats`) and reports
+    the speedup over one worker, plus the largest score difference from the
+    one-worker result (0.0 when the output is bitwise-stable).
+
+    Args:
+        G (nx.DiGraph or EdgeList): The graph.
+        worker_counts (list, optional): Defaults to 1, 2, 4, ... up to the CPU count.
+        repeats (int): Timed runs per worker count.
+        **kwargs: Passed through to pagerank_weighted_iterative.
+
+    Returns:
+        list: One dict per worker count with 'workers', 'wall_time',
+            'speedup', 'iterations' and 'max_abs_diff'.
+    """
+    if worker_counts is None:
+        worker_counts = sorted({1, default_workers()} | {2 ** i for i in range(default_workers().bit_length())})
+    kwargs.setdefault('history_stride', None) # Scores only, not the history
+    reports = []
+    baseline = None
+    for workers in worker_counts:
+        best = None
+        for _ in range(repeats):
+            _, history = pagerank_weighted_iterative(G, engine='parallel', workers=workers, **kwargs)
+            if best is None or history.info['wall_time'] < best.info['wall_time']:
+                best = history
+        scores = best[-1].to_array()
+        if baseline is None:
+            baseline = (best.info['wall_time'], scores)
+        reports.append({
+            'workers': workers,
+            'wall_time': best.info['wall_time'],
+            'speedup': baseline[0] / best.info['wall_time'] if best.info['wall_time'] > 0 else float('nan'),
+            'iterations': best.info['iterations'],
+            'max_abs_diff': float(np.abs(scores - baseline[1]).max()) if len(scores) else 0.0,
+        })
+    return reports
+
+
+@metrics.timed('pagerank.batch')
+def pagerank_batch(G, alphas=0.85, personalizations=None, max_iter=100,
+                   tol=1.0e-6, weight='weight', dangling=None):
+    """
+    Computes K PageRank vectors at once against one shared transition matrix.
+
+    The K score vectors are iterated together as an N x K matrix, so each
+    step is one sparse mat-mat product instead of K mat-vecs, and dangling
+    nodes and out-weights are derived only once. Convergence is tracked per
+    column; converged columns drop out of the product.
+
+    Args:
+        G (nx.DiGraph or EdgeList): The graph.
+        alphas (float or list): Damping factor(s).
+        personalizations (list, optional): One entry per column, either a
+            {node: value} dict (must cover all nodes) or a single node label,
+            meaning personalized PageRank seeded at that node. None = uniform.
+        max_iter (int): Maximum iterations.
+        tol (float): Tolerance for convergence (per column, as in
+            pagerank_weighted_iterative).
+        weight (str): Edge attribute key for weights.
+        dangling (dict, optional): Shared dangling distribution; by default
+            each column uses its own personalization vector.
+
+    Returns:
+        tuple: (list of K {node: score} dicts, dict with 'scores' (N x K array),
+            'nodes', 'iterations' and 'converged' per column, and 'wall_time')
+    """
+    alphas_list = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+    K = max(len(alphas_list), len(personalizations) if personalizations is not None else 1)
+    if len(alphas_list) == 1:
+        alphas_list = np.repeat(alphas_list, K)
+    if personalizations is not None and len(personalizations) != K:
+        raise ValueError("alphas and personalizations must have the same length")
+    if len(alphas_list) != K:
+        raise ValueError("alphas and personalizations must have the same length")
+
+    T = TransitionMatrix(G, weight=weight)
+    N = len(T)
+    if N == 0:
+        return [{} for _ in range(K)], {'scores': np.zeros((0, K)), 'nodes': [], 'iterations': np.zeros(K, dtype=int),
+                                         'converged': np.ones(K, dtype=bool), 'wall_time': 0.0}
+
+    start = time.perf_counter()
+    uniform = np.full(N, 1.0 / N)
+    P = np.empty((N, K))
+    for k in range(K):
+        entry = None if personalizations is None else personalizations[k]
+        if entry is None:
+            P[:, k] = uniform
+        elif isinstance(entry, dict):
+            P[:, k] = _normalized_vector(T, entry, "Personalization", uniform)
+        else:
+            if entry not in T.index:
+                raise ValueError(f"Personalization seed node {entry!r} is not in the graph")
+            P[:, k] = 0.0
+            P[T.index[entry], k] = 1.0
+    D = P if dangling is None else np.repeat(_normalized_vector(T, dangling, "Dangling", uniform)[:, None], K, axis=1)
+
+    X = np.empty((N, K))
+    iterations = np.zeros(K, dtype=int)
+    converged = np.zeros(K, dtype=bool)
+    # Work on compact copies of the active columns; they are only re-gathered when a column finishes
+    active = np.arange(K)
+    Xa, Pa, Da, a = np.full((N, K), 1.0 / N), P, D, alphas_list
+    for _ in range(max_iter):
+        danglesum = a * Xa[T.dangling_mask].sum(axis=0)
+        Xnew = T.matrix @ Xa
+        Xnew *= a
+        if dangling is None:
+            Xnew += Pa * (danglesum + 1.0 - a)
+        else:
+            Xnew += Da * danglesum + Pa * (1.0 - a)
+        iterations[active] += 1
+
+        # Check convergence per column (L1 norm); finished columns drop out
+        err = np.abs(Xnew - Xa).sum(axis=0)
+        Xa = Xnew
+        done = err < N * tol
+        if done.any():
+            X[:, active[done]] = Xa[:, done]
+            converged[active[done]] = True
+            keep = ~done
+            active, Xa, Pa, Da, a = active[keep], Xa[:, keep], Pa[:, keep], Da[:, keep], a[keep]
+            if len(active) == 0:
+                break
+    X[:, active] = Xa
+
+    if len(active):
+        print(f"Warning: {len(active)} of {K} PageRank columns did not converge within {max_iter} iterations.")
+
+    info = {
+        'scores': X,
+        'nodes': T.nodes,
+        'iterations': iterations,
+        'converged': converged,
+        'wall_time': time.perf_counter() - start,
+    }
+    return [T.to_dict(X[:, k]) for k in range(K)], info
+
+
+class IncrementalPageRank:
+    """
+    PageRank that is kept up to date as a graph changes by a few edges.
+
+    The transition matrix and score vector are cached; `update()` patches
+    the matrix with an edge delta and corrects the previous scores instead of
+    recomputing from uniform.
+
+    Two update methods are available:
+        'push': residual push (Gauss-Southwell). The residual of the old
+            scores under the new matrix is non-zero only around the changed
+            nodes, and only nodes whose residual exceeds `tol` are touched,
+            so small deltas cost work proportional to the affected area.
+        'warm': power iteration warm-started from the previous scores.
+
+    Args:
+        G (nx.DiGraph or EdgeList): The graph.
+        alpha, personalization, dangling, weight, max_iter, tol: As in
+            pagerank_weighted_iterative.
+        initial_scores (dict, optional): Known scores for G (skips the initial solve).
+    """
+
+    def __init__(self, G, alpha=0.85, personalization=None, dangling=None,
+                 weight='weight', max_iter=100, tol=1.0e-6, initial_scores=None):
+        self.T = TransitionMatrix(G, weight=weight)
+        self.T.build_by_source() # Up front, so the first update() is as cheap as the later ones
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.tol = tol
+        N = len(self.T)
+        uniform = np.full(N, 1.0 / N) if N else np.zeros(0)
+        self.p = _normalized_vector(self.T, personalization, "Personalization", uniform)
+        self.d = _normalized_vector(self.T, dangling, "Dangling", self.p)
+        self.last_update = {}
+        if initial_scores is not None:
+            self.x = self.T.to_vector(initial_scores)
+        else:
+            self.x = uniform
+            self._warm_start()
+
+    @property
+    def scores(self):
+        return self.T.to_dict(self.x)
+
+    def _warm_start(self):
+        # Only the final vector is needed: record iteration 0 and keep the last one pending
+        history = PageRankHistory(self.T.nodes, capacity=2, stride=self.max_iter + 1)
+        history.append(self.x, iteration=0)
+        self.x, residuals, converged = _solve_power(self.T, self.x, self.alpha, self.p, self.d,
+                                                   self.max_iter, self.tol, history)
+        if not converged:
+            print(f"Warning: PageRank did not converge within {self.max_iter} iterations.")
+            metrics.increment('pagerank.not_converged')
+        return {'iterations': len(residuals), 'converged': converged}
+
+    def _outflow(self, sources):
+        """Score the nodes `sources` pass on in one step (alpha * their out-links or dangling jump)."""
+        x = self.x[sources]
+        flow = self.alpha * (self.T.by_source[:, sources] @ x)
+        dangling_mass = x[self.T.dangling_mask[sources]].sum()
+        if dangling_mass:
+            flow += self.alpha * dangling_mass * self.d
+        return flow
+
+    def _push(self, r):
+        """Corrects self.x for the current matrix by pushing the residual r (vectorized rounds)."""
+        T, alpha = self.T, self.alpha
+        touched = np.zeros(len(T), dtype=bool)
+        rounds = 0
+        while rounds < self.max_iter * 10:
+            active = np.flatnonzero(np.abs(r) > self.tol)
+            if len(active) == 0:
+                break
+            rounds += 1
+            touched[active] = True
+            ra = r[active]
+            self.x[active] += ra
+            r[active] = 0.0
+            # Spread the pushed residual along the out-links of the active nodes
+            r += alpha * (T.by_source[:, active] @ ra)
+            dangling_mass = ra[T.dangling_mask[active]].sum()
+            if dangling_mass:
+                r += alpha * dangling_mass * self.d
+        converged = rounds < self.max_iter * 10
+        if not converged:
+            print("Warning: PageRank push update did not converge.")
+        return {'rounds': rounds, 'touched': int(touched.sum()), 'converged': converged}
+
+    @metrics.timed('pagerank.incremental_update')
+    def update(self, added=(), removed=(), reweighted=(), method='push'):
+        """
+        Applies an edge delta and updates the scores.
+
+        Args:
+            added (iterable): (u, v, weight) edges to add.
+            removed (iterable): (u, v) edges to remove.
+            reweighted (iterable): (u, v, weight) edges with a new weight.
+            method (str): 'push' (localized) or 'warm' (warm-started power iteration).
+
+        Returns:
+            dict: Updated PageRank scores. Work statistics are in `last_update`.
+        """
+        if method not in ('push', 'warm'):
+            raise ValueError(f"Unknown update method: {method!r}")
+        start = time.perf_counter()
+        added, removed, reweighted = list(added), list(removed), list(reweighted)
+        if method == 'push':
+            # The scores solve the old matrix, so the new residual is non-zero
+            # only where the changed sources' out-links lead
+            sources = np.unique([self.T.index[e[0]] for e in added + removed + reweighted if e[0] in self.T.index])
+            before = self._outflow(sources.astype(np.int64))
+        changed = self.T.apply_edge_delta(added, removed, reweighted)
+        stats = self._push(self._outflow(changed) - before) if method == 'push' else self._warm_start()
+        stats.update(method=method, changed_sources=len(changed), wall_time=time.perf_counter() - start)
+        self.last_update = stats
+        return self.scores
+
+
+# --- Monte Carlo estimation ---
+
+# Visited positions buffered per batch before they are folded into the counts
+VISIT_FLUSH_SIZE = 1_000_000
+
+class MonteCarloPageRank:
+    """
+    Approximate PageRank from random-surfer walks, refined batch by batch.
+
+    Each walk starts at a node drawn from the personalization vector. At
+    every step it continues with probability alpha along an out-edge chosen
+    in proportion to its weight (from a dangling node it jumps to a node
+    drawn from the dangling distribution), and otherwise ends (teleports).
+    A node's score is its share of all visits, which converges to PageRank.
+    All walks of a batch advance together as arrays.
+
+    Error bars are batch-means standard errors (the spread of the per-batch
+    estimates / sqrt(batches)), so they shrink as more batches are run.
+
+    Args:
+        G (nx.DiGraph or EdgeList): The graph.
+        alpha (float): Damping factor (0 <= alpha < 1).
+        personalization (dict, optional): Start/teleport distribution.
+        dangling (dict, optional): Distribution for dangling nodes.
+        weight (str): Edge attribute key for weights.
+        seed (int, optional): Random seed.
+    """
+
+    def __init__(self, G, alpha=0.85, personalization=None, dangling=None, weight='weight', seed=None):
+        if not 0.0 <= alpha < 1.0:
+            raise ValueError("Monte Carlo PageRank needs 0 <= alpha < 1 (with alpha = 1 walks never end)")
+        self.T = TransitionMatrix(G, weight=weight)
+        self.alpha = alpha
+        N = len(self.T)
+        uniform = np.full(N, 1.0 / N) if N else np.zeros(0)
+        p = _normalized_vector(self.T, personalization, "Personalization", uniform)
+        d = _normalized_vector(self.T, dangling, "Dangling", p)
+        self._p_cum = np.cumsum(p)
+        self._d_cum = np.cumsum(d)
+
+        # Per source node, its out-edges' transition probabilities as one cumulative array
+        by_source = self.T.by_source
+        self._indptr = by_source.indptr
+        self._targets = by_source.indices
+        self._edge_cum = np.cumsum(by_source.data)
+        starts = np.concatenate([[0.0], self._edge_cum])
+        self._edge_lo = starts[self._indptr[:-1]]
+        self._edge_hi = starts[self._indptr[1:]]
+
+        self.rng = np.random.default_rng(seed)
+        self._visits = np.zeros(N)
+        self._batch_sum = np.zeros(N) # Sum and sum of squares of per-batch estimates
+        self._batch_sq = np.zeros(N)
+        self.walks = 0
+        self.batches = 0
+
+    def _draw(self, cum, size):
+        """Samples `size` indices from a distribution given as a cumulative array."""
+        idx = np.searchsorted(cum, self.rng.random(size) * cum[-1], side='right')
+        return np.minimum(idx, len(cum) - 1)
+
+    def _walk_batch(self, num_walks, stop=None):
+        """
+        Runs num_walks walks to completion and returns their visit counts
+        (None if `stop` was set before the walks finished).
+        """
+        N = len(self.T)
+        counts = np.zeros(N)
+        pos = self._draw(self._p_cum, num_walks)
+        visited, pending = [], 0
+        while len(pos):
+            if stop is not None and stop.is_set():
+                return None
+            visited.append(pos)
+            pending += len(pos)
+            if pending >= VISIT_FLUSH_SIZE: # Long walks (alpha near 1): keep memory bounded
+                counts += np.bincount(np.concatenate(visited), minlength=N)
+                visited, pending = [], 0
+            pos = pos[self.rng.random(len(pos)) < self.alpha] # Walks that follow a link
+            if not len(pos):
+                break
+            dangling = self.T.dangling_mask[pos]
+            nxt = np.empty_like(pos)
+            if dangling.any():
+                nxt[dangling] = self._draw(self._d_cum, int(dangling.sum()))
+            src = pos[~dangling]
+            lo, hi = self._edge_lo[src], self._edge_hi[src]
+            k = np.searchsorted(self._edge_cum, lo + self.rng.random(len(src)) * (hi - lo), side='right')
+            k = np.clip(k, self._indptr[src], self._indptr[src + 1] - 1)
+            nxt[~dangling] = self._targets[k]
+            pos = nxt
+        if visited:
+            counts += np.bincount(np.concatenate(visited), minlength=N)
+        return counts
+
+    def run(self, num_walks, batch_size=10_000, callback=None, stop=None):
+        """
+        Adds num_walks walks in batches of batch_size.
+
+        Args:
+            callback (callable, optional): Called as callback(self) after each
+                batch; returning False stops early.
+            stop (threading.Event, optional): Checked at every walk step; once
+                set, the unfinished batch is discarded and run() returns.
+
+        Returns:
+            MonteCarloPageRank: self, for chaining.
+        """
+        if len(self.T) == 0:
+            return self
+        done = 0
+        while done < num_walks:
+            size = min(batch_size, num_walks - done)
+            visits = self._walk_batch(size, stop)
+            if visits is None:
+                break
+            estimate = visits / visits.sum()
+            self._visits += visits
+            self._batch_sum += estimate
+            self._batch_sq += estimate ** 2
+            self.walks += size
+            self.batches += 1
+            done += size
+            if callback is not None and callback(self) is False:
+                break
+        return self
+
+    @property
+    def scores(self):
+        """Current estimate (array in T.nodes order, sums to 1)."""
+        total = self._visits.sum()
+        return self._visits / total if total else self._visits
+
+    @property
+    def stderr(self):
+        """Standard error of each score (NaN until two batches have run)."""
+        B = self.batches
+        if B < 2:
+            return np.full(len(self.T), np.nan)
+        var = (self._batch_sq - self._batch_sum ** 2 / B) / (B - 1)
+        return np.sqrt(np.clip(var, 0.0, None) / B)
+
+    def to_dict(self):
+        return self.T.to_dict(self.scores)
+
+    def top_k(self, k):
+        """The k highest estimates as [(node, score, stderr), ...], best first."""
+        scores, stderr = self.scores, self.stderr
+        return [(self.T.nodes[i], float(scores[i]), float(stderr[i])) for i in top_k_indices(scores, k)]
+
+
+def pagerank_monte_carlo(G, alpha=0.85, personalization=None, num_walks=100_000, batch_size=10_000,
+                         weight='weight', dangling=None, seed=None, callback=None):
+    """
+    Approximate PageRank by random-surfer walks (see MonteCarloPageRank).
+
+    Much cheaper than the exact solvers for a rough ranking: the top nodes
+    settle after a few thousand walks, and the error bars tell how far each
+    score can be trusted.
+
+    Args:
+        G (nx.DiGraph or EdgeList): The graph.
+        alpha (float): Damping factor (0 <= alpha < 1).
+        personalization (dict, optional): Start/teleport distribution.
+        num_walks (int): Total walks.
+        batch_size (int): Walks per vectorized batch (and per error-bar sample).
+        weight (str): Edge attribute key for weights.
+        dangling (dict, optional): Distribution for dangling nodes.
+        seed (int, optional): Random seed.
+        callback (callable, optional): callback(estimator) after each batch;
+            return False to stop early.
+
+    Returns:
+        tuple: ({node: score}, dict with 'stderr' ({node: standard error}),
+            'walks', 'batches' and 'wall_time')
+    """
+    start = time.perf_counter()
+    estimator = MonteCarloPageRank(G, alpha, personalization, dangling, weight, seed)
+    estimator.run(num_walks, batch_size, callback)
+    info = {
+        'stderr': estimator.T.to_dict(estimator.stderr),
+        'walks': estimator.walks,
+        'batches': estimator.batches,
+        'wall_time': time.perf_counter() - start,
+    }
+    return estimator.to_dict(), info
+
+
+def _pagerank_on_disk(csr, alpha, personalization, max_iter, tol, dangling, initial_scores, history_opts):
+    """pagerank_weighted_iterative for a DiskCSR (node labels are 0..N-1)."""
+    N = csr.num_nodes
+    nodes = range(N)
+
+    def to_vector(values, name):
+        if values is None:
+            return None
+        if name and len(set(nodes) - set(values)):
+            raise ValueError(f"{name} vector missing nodes: {set(nodes) - set(values)}")
+        vec = np.zeros(N)
+        keys = np.fromiter(values.keys(), dtype=np.int64, count=len(values))
+        vals = np.fromiter(values.values(), dtype=np.float64, count=len(values))
+        inside = (keys >= 0) & (keys < N)
+        vec[keys[inside]] = vals[inside]
+        return vec
+
+    history = _new_history(nodes, max_iter, history_opts)
+    start = time.perf_counter()
+    x, info = pagerank_disk(csr, alpha, to_vector(personalization, "Personalization"), max_iter, tol,
+                            to_vector(dangling, "Dangling"), to_vector(initial_scores, None), history=history)
+    history.info = dict(info, method='power', wall_time=time.perf_counter() - start)
+
+    if not info['converged']:
+        print(f"Warning: PageRank did not converge within {max_iter} iterations.")
+        metrics.increment('pagerank.not_converged')
+
+    return dict(zip(nodes, x.tolist())), history.finalize()
+
+
+def _pagerank_dict(G, alpha, personalization, max_iter, tol, weight, dangling, initial_scores, history_opts):
+    """Reference dict-based power iteration (slow, O(E*deg) Python work per step)."""
     N = len(G)
     if N == 0:
-        return {}, []
+        return {}, PageRankHistory([], **history_opts).finalize()
 
     # Initial vector
     if initial_scores is None:
@@ -35,7 +1146,8 @@ def pagerank_weighted_iterative(G, alpha=0.85, personalization=None,
         else:
             x = {k: v / s for k, v in initial_scores.items()}
 
-    history = [x.copy()] # Store initial state
+    history = _new_history(list(G), max_iter, history_opts)
+    history.append(x, iteration=0) # Store initial state
 
     # Personalization vector (uniform if not specified)
     if personalization is None:
@@ -68,6 +1180,8 @@ def pagerank_weighted_iterative(G, alpha=0.85, personalization=None,
 
 
     # Power iteration
+    start = time.perf_counter()
+    residuals = []
     converged = False
     for iteration in range(max_iter):
         xlast = x
@@ -85,16 +1199,26 @@ def pagerank_weighted_iterative(G, alpha=0.85, personalization=None,
             # Add contribution from dangling nodes and personalization/teleportation
             x[n] += danglesum * dangling_weights.get(n, 0) + (1.0 - alpha) * p.get(n, 0)
 
-        history.append(x.copy()) # Store current iteration state
+        history.append(x, iteration=iteration + 1) # Store current iteration state
 
         # Check convergence (L1 norm)
         err = sum(abs(x[n] - xlast[n]) for n in x)
+        residuals.append(err)
         if err < N * tol:
             converged = True
             # print(f"Converged after {iteration + 1} iterations.") # For debugging
             break
 
+    history.info = {
+        'method': 'power',
+        'iterations': len(residuals),
+        'residuals': np.asarray(residuals),
+        'converged': converged,
+        'wall_time': time.perf_counter() - start,
+    }
+
     if not converged:
         print(f"Warning: PageRank did not converge within {max_iter} iterations.")
+        metrics.increment('pagerank.not_converged')
 
-    return x, history
\ No newline at end of file
+    return x, history.finalize()
\ No newline at end of file
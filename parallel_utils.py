@@ -0,0 +1,122 @@
+# parallel_utils.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+# Fixed number of row blocks; results depend only on this, never on the worker count
+DEFAULT_NUM_BLOCKS = 64
+
+
+def default_workers():
+    """Number of worker threads used when none is given (one per CPU)."""
+    return os.cpu_count() or 1
+
+
+def row_partition(indptr, num_blocks=DEFAULT_NUM_BLOCKS):
+    """
+    Splits the rows of a CSR matrix into contiguous blocks of similar cost.
+
+    Each row costs its nonzeros plus one (for the element-wise work on the
+    score vector), so blocks are balanced for both sparse and dense rows.
+
+    Args:
+        indptr (np.ndarray): CSR row pointers (length N + 1).
+        num_blocks (int): Target number of blocks.
+
+    Returns:
+        np.ndarray: Block boundaries [0, ..., N] (strictly increasing).
+    """
+    n = len(indptr) - 1
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    cost = np.asarray(indptr, dtype=np.int64) + np.arange(n + 1)
+    targets = np.linspace(0, cost[-1], min(num_blocks, n) + 1)
+    bounds = np.searchsorted(cost, targets, side='left')
+    bounds[0], bounds[-1] = 0, n
+    return np.unique(bounds)
+
+
+class ParallelPowerIteration:
+    """
+    Power iteration with the mat-vec split into row blocks across threads.
+
+    Every worker computes its slice of the next score vector, plus that
+    slice's L1 change and dangling mass; the partial sums are then reduced
+    in block order. SciPy's CSR mat-vec and NumPy's ufuncs release the GIL,
+    so the blocks run concurrently without copying the matrix into worker
+    processes.
+
+    The row partition is fixed by `num_blocks`, so the iterates are
+    bitwise-identical for any number of workers.
+
+    Args:
+        matrix (scipy.sparse.csr_array): N x N transition matrix (rows = targets).
+        dangling_mask (np.ndarray): Boolean mask of dangling nodes.
+        workers (int, optional): Worker threads (default: one per CPU).
+        num_blocks (int): Number of row blocks.
+    """
+
+    def __init__(self, matrix, dangling_mask, workers=None, num_blocks=DEFAULT_NUM_BLOCKS):
+        self.workers = max(1, int(workers or default_workers()))
+        self.dangling_mask = dangling_mask
+        n = matrix.shape[0]
+        self.bounds = row_partition(matrix.indptr, num_blocks)
+        # Blocks share the parent's data/indices buffers; only the row pointers are copied
+        self.blocks = []
+        for start, stop in zip(self.bounds[:-1], self.bounds[1:]):
+            lo, hi = matrix.indptr[start], matrix.indptr[stop]
+            block = sp.csr_array((matrix.data[lo:hi], matrix.indices[lo:hi], matrix.indptr[start:stop + 1] - lo),
+                                 shape=(stop - start, n))
+            self.blocks.append((start, stop, block))
+
+    def _map(self, func):
+        """Runs func(k) for every block k."""
+        if self.workers == 1 or len(self.blocks) == 1:
+            for k in range(len(self.blocks)):
+                func(k)
+            return
+        list(self._executor.map(func, range(len(self.blocks))))
+
+    def dangling_sum(self, x):
+        """Total score on dangling nodes, reduced in block order."""
+        partial = [x[start:stop][self.dangling_mask[start:stop]].sum() for start, stop, _ in self.blocks]
+        return float(np.asarray(partial).sum())
+
+    def solve(self, x, alpha, p, d, max_iter, tol, history):
+        """
+        Iterates from x; same update and convergence rule as the sparse power solver.
+
+        Returns:
+            tuple: (x, list of L1 residuals, converged)
+        """
+        N = len(x)
+        err = np.zeros(len(self.blocks))
+        dangling = np.zeros(len(self.blocks))
+        # Double-buffered score vectors: read xlast, write x
+        xlast, x = np.array(x, dtype=np.float64), np.empty(N)
+        danglesum = alpha * self.dangling_sum(xlast)
+
+        def update_block(k):
+            start, stop, block = self.blocks[k]
+            xs = alpha * (block @ xlast)
+            xs += danglesum * d[start:stop]
+            xs += (1.0 - alpha) * p[start:stop]
+            x[start:stop] = xs
+            err[k] = np.abs(xs - xlast[start:stop]).sum()
+            dangling[k] = xs[self.dangling_mask[start:stop]].sum()
+
+        residuals = []
+        with ThreadPoolExecutor(max_workers=self.workers) as self._executor:
+            for iteration in range(max_iter):
+                self._map(update_block)
+                history.append(x, iteration=iteration + 1)
+
+                residual = float(err.sum())
+                residuals.append(residual)
+                danglesum = alpha * float(dangling.sum())
+                xlast, x = x, xlast
+                if residual < N * tol:
+                    return xlast, residuals, True
+        return xlast, residuals, False
@@ -1,116 +1,364 @@
 # plot_utils.py
+import numpy as np
 import plotly.graph_objects as go
-import networkx as nx # Needed for degree calculation in hover text
 
-def create_3d_figure(G, pos, node_scores, current_iter, G_nodes_list, G_edges_list, alpha):
-    """Creates the 3D Plotly figure for a specific iteration."""
+from history_utils import ScoreView
+from metrics_utils import metrics
 
-    if not G or not pos: # Handle empty graph/pos
-         return go.Figure()
+MIN_MARKER_SIZE, MAX_MARKER_SIZE = 8, 40 # Adjust min/max marker size
 
-    # --- Prepare Edge Data ---
-    edge_x, edge_y, edge_z = [], [], []
-    for u, v, data in G_edges_list:
-        if u in pos and v in pos: # Ensure nodes exist in pos dict
-            x0, y0, z0 = pos[u]
-            x1, y1, z1 = pos[v]
-            edge_x.extend([x0, x1, None]) # None separates lines
-            edge_y.extend([y0, y1, None])
-            edge_z.extend([z0, z1, None])
-        else:
-            print(f"Warning: Node position missing for edge ({u}, {v})")
+# Level-of-detail defaults: above these sizes only part of the graph is drawn
+DEFAULT_MAX_NODES = 3000
+DEFAULT_MAX_EDGES = 20000
+DEFAULT_TOP_K = 500
+DEFAULT_WEBGL_THRESHOLD = 1500 # Visible nodes above which 'auto' switches to 2D WebGL
+RENDER_MODES = ('auto', '3d', 'webgl', 'density')
+
+NODE_HOVERTEMPLATE = (
+    "<b>Node: %{customdata[0]}</b><br>"
+    "PageRank: %{marker.color:.5f}<br>"
+    "Weighted In-Degree: %{customdata[1]:.2f}<br>"
+    "Weighted Out-Degree: %{customdata[2]:.2f}"
+    "<extra></extra>" # Show only the custom text on hover
+)
+
+_HIDDEN_AXIS = dict(showbackground=False, showline=False, zeroline=False, showticklabels=False, title='')
+_HIDDEN_AXIS_2D = dict(showline=False, zeroline=False, showticklabels=False, showgrid=False, title='')
 
 
-    trace_edges = go.Scatter3d(
-        x=edge_x, y=edge_y, z=edge_z,
-        line=dict(width=1, color='#888'),
-        hoverinfo='none',
-        mode='lines',
-        name='Edges'
+def _scene_layout(mode='3d'):
+    """Layout shared by all figures (title is set per iteration)."""
+    layout = go.Layout(
+        showlegend=False,
+        hovermode='closest',
+        margin=dict(b=10, l=10, r=10, t=50), # Adjust margins
     )
+    if mode == '3d':
+        layout.scene = dict(
+            xaxis=_HIDDEN_AXIS,
+            yaxis=_HIDDEN_AXIS,
+            zaxis=_HIDDEN_AXIS,
+            camera=dict(
+                eye=dict(x=1.5, y=1.5, z=1.5) # Adjust initial viewpoint
+            ),
+            aspectratio=dict(x=1, y=1, z=1) # Ensure equal aspect ratio
+        )
+    else:
+        layout.xaxis = _HIDDEN_AXIS_2D
+        layout.yaxis = dict(_HIDDEN_AXIS_2D, scaleanchor='x')
+    return layout
 
-    # --- Prepare Node Data ---
-    node_x = [pos[node][0] for node in G_nodes_list if node in pos]
-    node_y = [pos[node][1] for node in G_nodes_list if node in pos]
-    node_z = [pos[node][2] for node in G_nodes_list if node in pos]
 
-    # Calculate node sizes and colors based on scores
-    min_size, max_size = 8, 40 # Adjust min/max marker size
-    current_scores_list = [node_scores.get(node, 0) for node in G_nodes_list] # Get scores safely
-    min_score = min(current_scores_list) if current_scores_list else 0
-    max_score = max(current_scores_list) if current_scores_list else 0
+def _title(current_iter, alpha, num_nodes, shown=None):
+    detail = '' if shown is None or shown == num_nodes else f' (showing {shown})'
+    return dict(
+        text=f'<b>3D PageRank Visualization</b><br>Iteration: {current_iter}, Alpha (α): {alpha:.2f}, Nodes: {num_nodes}{detail}',
+        x=0.5, # Center title
+        xanchor='center'
+    )
 
-    if max_score == min_score or not current_scores_list: # Avoid division by zero / handle empty
-        node_sizes = [15] * len(G_nodes_list)
-    else:
-        node_sizes = [
-            min_size + (max_size - min_size) * (node_scores.get(node, 0) - min_score) / (max_score - min_score)
-            for node in G_nodes_list
-        ]
-
-    node_colors = current_scores_list
-
-    # Create hover text for nodes
-    hover_texts = []
-    for node in G_nodes_list:
-        score = node_scores.get(node, 0)
-        in_degree = G.in_degree(node, weight='weight')
-        out_degree = G.out_degree(node, weight='weight')
-        text = (f"<b>Node: {node}</b><br>"
-                f"PageRank: {score:.5f}<br>"
-                f"Weighted In-Degree: {in_degree:.2f}<br>"
-                f"Weighted Out-Degree: {out_degree:.2f}")
-        hover_texts.append(text)
-
-
-    trace_nodes = go.Scatter3d(
-        x=node_x, y=node_y, z=node_z,
-        mode='markers',
-        marker=dict(
+
+def marker_sizes(scores):
+    """Scales scores linearly into [MIN_MARKER_SIZE, MAX_MARKER_SIZE]."""
+    if len(scores) == 0:
+        return np.zeros(0)
+    lo, hi = scores.min(), scores.max()
+    if hi == lo: # Avoid division by zero
+        return np.full(len(scores), 15.0)
+    return MIN_MARKER_SIZE + (MAX_MARKER_SIZE - MIN_MARKER_SIZE) * (scores - lo) / (hi - lo)
+
+
+def _weighted_sample(rng, weights, k):
+    """Indices of k items sampled without replacement, proportional to weight (Efraimidis-Spirakis)."""
+    if k >= len(weights):
+        return np.arange(len(weights))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    w = np.maximum(np.asarray(weights, dtype=np.float64), 1e-300)
+    keys = np.log(rng.random(len(w))) / w
+    return np.argpartition(keys, -k)[-k:]
+
+
+@metrics.timed('figure.level_of_detail')
+def _visible_nodes(rng, scores, max_nodes, top_k):
+    """(visible, is_top) node masks: the top_k nodes plus a score-weighted sample up to max_nodes."""
+    N = len(scores)
+    top_k = min(top_k, max_nodes, N)
+    is_top = np.zeros(N, dtype=bool)
+    if top_k:
+        is_top[np.argpartition(scores, N - top_k)[N - top_k:]] = True
+
+    if N <= max_nodes:
+        return np.ones(N, dtype=bool), is_top
+    visible = is_top.copy()
+    rest = np.flatnonzero(~is_top)
+    visible[rest[_weighted_sample(rng, scores[rest], max_nodes - top_k)]] = True
+    return visible, is_top
+
+
+def select_visible_nodes(scores, max_nodes=DEFAULT_MAX_NODES, top_k=DEFAULT_TOP_K, seed=0):
+    """
+    The node half of select_level_of_detail, for when the edges are not in
+    memory yet (e.g. to load only the plotted part of an on-disk graph).
+
+    Returns:
+        np.ndarray: Sorted visible node indices.
+    """
+    return np.flatnonzero(_visible_nodes(np.random.default_rng(seed), scores, max_nodes, top_k)[0])
+
+
+def select_level_of_detail(scores, src, dst, weight, max_nodes=DEFAULT_MAX_NODES,
+                           max_edges=DEFAULT_MAX_EDGES, top_k=DEFAULT_TOP_K, seed=0):
+    """
+    Picks the nodes and edges to draw for a large graph.
+
+    The top_k nodes by score are always kept (argpartition, no full sort);
+    the rest of the node budget is sampled proportionally to score. Edges
+    between visible nodes are kept if both ends are top-k nodes, and the rest
+    of the edge budget is sampled proportionally to edge weight.
+
+    Args:
+        scores (np.ndarray): Score per node.
+        src, dst, weight (np.ndarray): Edge arrays (node indices).
+        max_nodes, max_edges, top_k (int): Budgets.
+        seed (int): Seed for the sampling, so the selection is stable.
+
+    Returns:
+        tuple: (sorted visible node indices, visible edge indices)
+    """
+    rng = np.random.default_rng(seed)
+    visible, is_top = _visible_nodes(rng, scores, max_nodes, top_k)
+    candidates = np.flatnonzero(visible[src] & visible[dst])
+    if len(candidates) <= max_edges:
+        return np.flatnonzero(visible), candidates
+    core = candidates[is_top[src[candidates]] & is_top[dst[candidates]]]
+    if len(core) >= max_edges:
+        core = core[_weighted_sample(rng, weight[core], max_edges)]
+        return np.flatnonzero(visible), np.sort(core)
+    others = candidates[~(is_top[src[candidates]] & is_top[dst[candidates]])]
+    sampled = others[_weighted_sample(rng, weight[others], max_edges - len(core))]
+    return np.flatnonzero(visible), np.sort(np.concatenate([core, sampled]))
+
+
+def _project_2d(coords):
+    """Projects 3D coordinates onto their two principal axes."""
+    if len(coords) < 3:
+        return coords[:, :2]
+    centered = coords - coords.mean(axis=0)
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    return centered @ vt[:2].T
+
+
+class FigureTemplate:
+    """
+    The parts of the 3D figure that do not change between iterations.
+
+    Edge segments (NumPy arrays with NaN separators), node coordinates and
+    the weighted degrees shown on hover are computed once per graph/layout.
+    `figure()` then only swaps in the marker color and size arrays, so the
+    cost per iteration does not depend on the number of edges.
+
+    Large graphs are drawn at a reduced level of detail (see
+    select_level_of_detail), chosen once from `lod_scores` (e.g. the final
+    PageRank scores; weighted in-degree if omitted). Render modes:
+        '3d': Scatter3d (the default for small graphs).
+        'webgl': 2D Scattergl projection, for thousands of visible nodes.
+        'density': 2D histogram of PageRank mass over the projected layout.
+        'auto': '3d' up to webgl_threshold visible nodes, else 'webgl'.
+    """
+
+    @metrics.timed('figure.template')
+    def __init__(self, G, pos, G_nodes_list, G_edges_list, lod_scores=None,
+                 max_nodes=DEFAULT_MAX_NODES, max_edges=DEFAULT_MAX_EDGES,
+                 top_k=DEFAULT_TOP_K, render_mode='auto', webgl_threshold=DEFAULT_WEBGL_THRESHOLD):
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {render_mode!r}. Choose from {RENDER_MODES}")
+        self.nodes = [n for n in G_nodes_list if n in pos]
+        self.index = {n: i for i, n in enumerate(self.nodes)}
+        coords = np.array([pos[n] for n in self.nodes], dtype=np.float64).reshape(-1, 3)
+
+        # --- Edge arrays ---
+        idx = self.index
+        pairs = [(idx[u], idx[v], data.get('weight', 1.0)) for u, v, data in G_edges_list if u in idx and v in idx]
+        missing = len(G_edges_list) - len(pairs)
+        if missing:
+            print(f"Warning: Node position missing for {missing} edge(s)")
+        edge_arr = np.array(pairs, dtype=np.float64).reshape(-1, 3)
+        src, dst, weight = edge_arr[:, 0].astype(np.int64), edge_arr[:, 1].astype(np.int64), edge_arr[:, 2]
+
+        # --- Static hover data: label, weighted in-degree, weighted out-degree ---
+        N = len(self.nodes)
+        in_degree = np.bincount(dst, weights=weight, minlength=N)
+        out_degree = np.bincount(src, weights=weight, minlength=N)
+
+        # --- Level of detail: which nodes/edges are actually drawn ---
+        lod = in_degree if lod_scores is None else self.score_array(lod_scores)
+        self.visible, edge_sel = select_level_of_detail(lod, src, dst, weight, max_nodes, max_edges, top_k)
+        remap = np.full(N, -1, dtype=np.int64)
+        remap[self.visible] = np.arange(len(self.visible))
+        src, dst = remap[src[edge_sel]], remap[dst[edge_sel]]
+        self.num_edges_shown = len(edge_sel)
+        coords = coords[self.visible]
+
+        self.customdata = np.empty((len(self.visible), 3), dtype=object)
+        self.customdata[:, 0] = [str(self.nodes[i]) for i in self.visible]
+        self.customdata[:, 1] = in_degree[self.visible]
+        self.customdata[:, 2] = out_degree[self.visible]
+
+        if render_mode == 'auto':
+            render_mode = '3d' if len(self.visible) <= webgl_threshold else 'webgl'
+        self.mode = render_mode
+        self.coords = coords if self.mode == '3d' else _project_2d(coords)
+        if self.mode == 'density':
+            # Density is computed over all nodes, not just the visible ones; no edges are drawn
+            self.visible = np.arange(N)
+            self.coords = _project_2d(np.array([pos[n] for n in self.nodes], dtype=np.float64).reshape(-1, 3))
+            src = dst = np.zeros(0, dtype=np.int64)
+            self.num_edges_shown = 0
+
+        # --- Edge segments: start, end, NaN (separates lines) ---
+        segments = np.full((3 * len(src), self.coords.shape[1]), np.nan)
+        segments[0::3] = self.coords[src]
+        segments[1::3] = self.coords[dst]
+        self.edge_segments = segments
+
+        edge_style = dict(line=dict(width=1, color='#888'), hoverinfo='none', mode='lines', name='Edges')
+        if self.mode == '3d':
+            self.edge_trace = go.Scatter3d(x=segments[:, 0], y=segments[:, 1], z=segments[:, 2], **edge_style)
+        elif self.mode == 'webgl':
+            self.edge_trace = go.Scattergl(x=segments[:, 0], y=segments[:, 1], opacity=0.4, **edge_style)
+        else:
+            self.edge_trace = go.Scattergl(x=[], y=[], **edge_style) # Keeps the node trace at index 1
+
+    def score_array(self, node_scores):
+        """Scores in template node order (fast path for history rows)."""
+        if isinstance(node_scores, ScoreView) and (node_scores.nodes is self.nodes or node_scores.nodes == self.nodes):
+            return np.asarray(node_scores.to_array(), dtype=np.float64)
+        return np.array([node_scores.get(n, 0) for n in self.nodes], dtype=np.float64) # Get scores safely
+
+    def _marker(self, scores):
+        marker = dict(
             showscale=True,
             colorscale='Viridis', # Example colorscale
             reversescale=True,
-            color=node_colors,
-            size=node_sizes,
+            color=scores,
+            size=marker_sizes(scores),
             colorbar=dict(
                 thickness=15,
-                title='PageRank', # Removed titleside
+                title='PageRank',
                 xanchor='left',
-                # titleside='right' # Removed as requested
             ),
             line=dict(width=0.5, color='black'), # Marker outline
             opacity=0.9
-        ),
-        text=hover_texts,
-        hoverinfo='text', # Show only the custom text on hover
-        name='Nodes'
-    )
+        )
+        if self.mode == 'webgl':
+            marker['size'] = marker['size'] / 2 # Flat markers read larger than 3D ones
+        return marker
 
-    # --- Layout Configuration ---
-    layout = go.Layout(
-        # Use dict for title configuration
-        title=dict(
-             text=f'<b>3D PageRank Visualization</b><br>Iteration: {current_iter}, Alpha (α): {alpha:.2f}, Nodes: {len(G_nodes_list)}',
-             x=0.5, # Center title
-             xanchor='center'
-             # titlefont_size=16, # Removed as requested
-        ),
-        showlegend=False,
-        hovermode='closest',
-        margin=dict(b=10, l=10, r=10, t=50), # Adjust margins
-        scene=dict(
-            xaxis=dict(showbackground=False, showline=False, zeroline=False, showticklabels=False, title=''),
-            yaxis=dict(showbackground=False, showline=False, zeroline=False, showticklabels=False, title=''),
-            zaxis=dict(showbackground=False, showline=False, zeroline=False, showticklabels=False, title=''),
-            camera=dict(
-                eye=dict(x=1.5, y=1.5, z=1.5) # Adjust initial viewpoint
-            ),
-            aspectratio=dict(x=1, y=1, z=1) # Ensure equal aspect ratio
-        ),
-        # annotations=[ # Add annotations if needed, e.g., for edge weights if desired later
-        #     ...
-        # ]
-    )
+    def node_trace(self, scores):
+        """Full node trace for the visible nodes (scores over all nodes)."""
+        scores = scores[self.visible]
+        if self.mode == 'density':
+            return go.Histogram2d(
+                x=self.coords[:, 0], y=self.coords[:, 1], z=scores, histfunc='sum',
+                nbinsx=60, nbinsy=60, colorscale='Viridis', reversescale=True,
+                colorbar=dict(thickness=15, title='PageRank', xanchor='left'),
+                hovertemplate="PageRank mass: %{z:.5f}<extra></extra>", name='Nodes'
+            )
+        style = dict(mode='markers', marker=self._marker(scores), customdata=self.customdata,
+                     hovertemplate=NODE_HOVERTEMPLATE, name='Nodes')
+        if self.mode == '3d':
+            return go.Scatter3d(x=self.coords[:, 0], y=self.coords[:, 1], z=self.coords[:, 2], **style)
+        return go.Scattergl(x=self.coords[:, 0], y=self.coords[:, 1], **style)
+
+    def node_frame(self, scores):
+        """Partial node trace with only the per-iteration arrays, for animation frames."""
+        scores = scores[self.visible]
+        if self.mode == 'density':
+            return go.Histogram2d(z=scores)
+        marker = dict(color=scores, size=self._marker(scores)['size'], cmin=scores.min(), cmax=scores.max())
+        return go.Scatter3d(marker=marker) if self.mode == '3d' else go.Scattergl(marker=marker)
+
+    @metrics.timed('figure.build')
+    def figure(self, node_scores, current_iter, alpha):
+        """Builds the figure for one iteration."""
+        scores = self.score_array(node_scores)
+        layout = _scene_layout(self.mode)
+        layout.title = _title(current_iter, alpha, len(self.nodes), len(self.visible))
+        return go.Figure(data=[self.edge_trace, self.node_trace(scores)], layout=layout)
+
+
+    @metrics.timed('figure.animated')
+    def animated_figure(self, history, alpha, frame_duration=0.5):
+        """
+        Builds one figure that animates all history rows in the browser.
+
+        Each go.Frame only carries the node trace's marker color/size (and
+        the title), so the edge trace is sent once instead of once per step.
+
+        Args:
+            history (PageRankHistory or list): Scores per iteration.
+            alpha (float): Damping factor, shown in the title.
+            frame_duration (float): Seconds per frame.
+        """
+        iterations = getattr(history, 'iterations', range(len(history)))
+        fig = self.figure(history[0], int(iterations[0]), alpha)
+        duration = int(frame_duration * 1000)
+
+        frames = []
+        for row, it in zip(history, iterations):
+            frames.append(go.Frame(
+                name=str(int(it)),
+                traces=[1], # Node trace only
+                data=[self.node_frame(self.score_array(row))],
+                layout=go.Layout(title=_title(int(it), alpha, len(self.nodes), len(self.visible))),
+            ))
+        fig.frames = frames
+
+        play_args = dict(frame=dict(duration=duration, redraw=True), fromcurrent=True, transition=dict(duration=0))
+        fig.update_layout(
+            updatemenus=[dict(
+                type='buttons', direction='left', x=0.0, y=0.0, xanchor='left', yanchor='top', showactive=False,
+                buttons=[
+                    dict(label='▶ Play', method='animate', args=[None, play_args]),
+                    dict(label='⏸ Pause', method='animate',
+                         args=[[None], dict(frame=dict(duration=0, redraw=False), mode='immediate')]),
+                ],
+            )],
+            sliders=[dict(
+                x=0.15, len=0.85, y=0.0, yanchor='top',
+                currentvalue=dict(prefix='Iteration: '),
+                steps=[dict(label=f.name, method='animate',
+                            args=[[f.name], dict(mode='immediate', frame=dict(duration=0, redraw=True),
+                                                 transition=dict(duration=0))])
+                       for f in frames],
+            )],
+        )
+        return fig
+
+
+def create_3d_figure(G, pos, node_scores, current_iter, G_nodes_list, G_edges_list, alpha, template=None):
+    """
+    Creates the 3D Plotly figure for a specific iteration.
+
+    Pass a FigureTemplate built once for the graph/layout to avoid rebuilding
+    the edge trace and degree data on every call.
+    """
+
+    if not G or not pos: # Handle empty graph/pos
+         return go.Figure()
+
+    if template is None:
+        template = FigureTemplate(G, pos, G_nodes_list, G_edges_list)
+    return template.figure(node_scores, current_iter, alpha)
+
+
+def create_animated_figure(G, pos, history, G_nodes_list, G_edges_list, alpha, frame_duration=0.5, template=None):
+    """Creates a single 3D figure that plays all iterations client-side (Plotly frames)."""
+
+    if not G or not pos or not history:
+        return go.Figure()
 
-    fig = go.Figure(data=[trace_edges, trace_nodes], layout=layout)
-    return fig
\ No newline at end of file
+    if template is None:
+        template = FigureTemplate(G, pos, G_nodes_list, G_edges_list)
+    return template.animated_figure(history, alpha, frame_duration)
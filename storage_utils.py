@@ -0,0 +1,461 @@
+# storage_utils.py
+import io
+import json
+import os
+import tempfile
+import zipfile
+from typing import NamedTuple
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from graph_utils import EdgeList
+from history_utils import PageRankHistory
+
+# Record layout of binary edge-list files: little-endian int32 src, int32 dst, float32 weight
+BINARY_EDGE_DTYPE = np.dtype([('src', '<i4'), ('dst', '<i4'), ('weight', '<f4')])
+CSR_FORMAT_VERSION = 1
+BUNDLE_FORMAT_VERSION = 1
+
+
+def _has_header(path, sep):
+    """True if the first data line of a text edge list is not numeric (a header such as 'src,dst,weight')."""
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split() if sep == r'\s+' else line.split(sep)
+            try:
+                [float(v) for v in fields[:3]]
+            except ValueError:
+                return True
+            return False
+    return False
+
+
+def _read_edge_chunks(path, fmt='auto', chunk_size=1_000_000, delimiter=None, header='auto'):
+    """
+    Yields (src, dst, weight) array chunks from an edge-list file.
+
+    Text files (CSV/TSV) have two or three columns: src, dst and an optional
+    weight (defaults to 1). Node ids must be non-negative integers. Binary
+    files are raw BINARY_EDGE_DTYPE records.
+    """
+    if fmt == 'auto':
+        ext = os.path.splitext(path)[1].lower()
+        fmt = {'.bin': 'binary', '.tsv': 'tsv', '.txt': 'tsv'}.get(ext, 'csv')
+
+    if fmt == 'binary':
+        records = np.memmap(path, dtype=BINARY_EDGE_DTYPE, mode='r')
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            yield chunk['src'].astype(np.int64), chunk['dst'].astype(np.int64), chunk['weight'].astype(np.float32)
+        return
+
+    if fmt not in ('csv', 'tsv'):
+        raise ValueError(f"Unknown edge-list format: {fmt!r}")
+    sep = delimiter or (',' if fmt == 'csv' else r'\s+')
+    if header == 'auto':
+        header = 0 if _has_header(path, sep) else None
+    reader = pd.read_csv(path, sep=sep, header=header, comment='#', chunksize=chunk_size)
+    for frame in reader:
+        values = frame.to_numpy()
+        if values.shape[1] < 2:
+            raise ValueError("Edge list needs at least two columns (src, dst)")
+        weight = values[:, 2].astype(np.float32) if values.shape[1] > 2 else np.ones(len(values), dtype=np.float32)
+        yield values[:, 0].astype(np.int64), values[:, 1].astype(np.int64), weight
+
+
+def convert_edge_list(path, out_dir, fmt='auto', num_nodes=None, chunk_size=1_000_000,
+                      delimiter=None, header='auto', cancel_check=None):
+    """
+    Converts an edge-list file into a compact on-disk CSR graph.
+
+    The file is streamed twice in chunks, so it never has to fit in memory:
+    the first pass counts in-degrees, out-weights and the node count, the
+    second scatters each edge into its slot (a counting sort by target).
+    Rows are *target* nodes and column indices are their in-neighbours,
+    which is the layout the PageRank mat-vec reads in row blocks.
+
+    Files written to out_dir (all .npy, memory-mappable):
+        indptr (int64, N+1), indices (int32, E), weights (float32, E),
+        out_weight (float64, N), plus meta.json.
+
+    Args:
+        path (str): Edge-list file (CSV, TSV/whitespace or binary records).
+        out_dir (str): Directory for the CSR files.
+        fmt (str): 'auto' (by extension), 'csv', 'tsv' or 'binary'.
+        num_nodes (int, optional): Node count (default: max node id + 1).
+        header (int, optional): Header row for text files (None = no header,
+            'auto' = skip the first row if it is not numeric).
+        cancel_check (callable, optional): Called before every chunk; an
+            exception raised from it (e.g. JobCancelled) aborts the conversion.
+
+    Returns:
+        DiskCSR: The converted graph, memory-mapped.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Pass 1: sizes and per-row counts
+    in_count = np.zeros(0, dtype=np.int64)
+    out_weight = np.zeros(0, dtype=np.float64)
+    n = 0 if num_nodes is None else int(num_nodes)
+    num_edges = 0
+    for src, dst, weight in _read_edge_chunks(path, fmt, chunk_size, delimiter, header):
+        if cancel_check is not None:
+            cancel_check()
+        if len(src) == 0:
+            continue
+        if min(src.min(), dst.min()) < 0:
+            raise ValueError("Node ids must be non-negative integers")
+        top = int(max(src.max(), dst.max())) + 1
+        if num_nodes is not None and top > num_nodes:
+            raise ValueError(f"Edge refers to node {top - 1}, but num_nodes={num_nodes}")
+        n = max(n, top)
+        if len(in_count) < n:
+            in_count = np.concatenate([in_count, np.zeros(n - len(in_count), dtype=np.int64)])
+            out_weight = np.concatenate([out_weight, np.zeros(n - len(out_weight))])
+        in_count += np.bincount(dst, minlength=len(in_count))
+        out_weight += np.bincount(src, weights=weight, minlength=len(out_weight))
+        num_edges += len(src)
+    in_count = np.concatenate([in_count, np.zeros(n - len(in_count), dtype=np.int64)])
+    out_weight = np.concatenate([out_weight, np.zeros(n - len(out_weight))])
+
+    indptr = np.lib.format.open_memmap(os.path.join(out_dir, 'indptr.npy'), mode='w+', dtype=np.int64, shape=(n + 1,))
+    indptr[0] = 0
+    np.cumsum(in_count, out=indptr[1:])
+    indices = np.lib.format.open_memmap(os.path.join(out_dir, 'indices.npy'), mode='w+', dtype=np.int32, shape=(num_edges,))
+    weights = np.lib.format.open_memmap(os.path.join(out_dir, 'weights.npy'), mode='w+', dtype=np.float32, shape=(num_edges,))
+    np.save(os.path.join(out_dir, 'out_weight.npy'), out_weight)
+
+    # Pass 2: scatter every edge to cursor[dst] + its rank among same-target edges in the chunk
+    cursor = np.array(indptr[:-1])
+    for src, dst, weight in _read_edge_chunks(path, fmt, chunk_size, delimiter, header):
+        if cancel_check is not None:
+            cancel_check()
+        if len(src) == 0:
+            continue
+        order = np.argsort(dst, kind='stable')
+        rows = dst[order]
+        uniq, first, counts = np.unique(rows, return_index=True, return_counts=True)
+        slot = cursor[rows] + (np.arange(len(rows)) - np.repeat(first, counts))
+        indices[slot] = src[order]
+        weights[slot] = weight[order]
+        cursor[uniq] += counts
+    indptr.flush()
+    indices.flush()
+    weights.flush()
+    del indptr, indices, weights
+
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump({'version': CSR_FORMAT_VERSION, 'num_nodes': n, 'num_edges': num_edges, 'rows': 'target'}, f)
+    return DiskCSR(out_dir)
+
+
+def load_edge_list_bytes(data, filename, work_dir=None, cancel_check=None):
+    """
+    Converts an uploaded edge-list file (raw bytes) into a DiskCSR.
+
+    The format is picked from the file extension as in convert_edge_list,
+    and a header row is detected automatically. Files are written under
+    work_dir (a new temporary directory by default, which the caller should
+    remove once the graph is no longer needed). cancel_check is passed to
+    convert_edge_list.
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix='pagerank_graph_')
+    path = os.path.join(work_dir, os.path.basename(filename) or 'edges.csv')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return convert_edge_list(path, os.path.join(work_dir, 'csr'), cancel_check=cancel_check)
+
+
+class DiskCSR:
+    """
+    A graph stored by convert_edge_list, opened with numpy.memmap.
+
+    Only the O(N) vectors (row pointers, out-weights) are touched eagerly;
+    edges are read from disk one row block at a time.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != CSR_FORMAT_VERSION:
+            raise ValueError(f"Unsupported CSR format version: {meta.get('version')!r}")
+        self.num_nodes = meta['num_nodes']
+        self.num_edges = meta['num_edges']
+        self.indptr = np.load(os.path.join(directory, 'indptr.npy'), mmap_mode='r')
+        self.indices = np.load(os.path.join(directory, 'indices.npy'), mmap_mode='r')
+        self.weights = np.load(os.path.join(directory, 'weights.npy'), mmap_mode='r')
+        self.out_weight = np.load(os.path.join(directory, 'out_weight.npy'), mmap_mode='r')
+
+    def row_blocks(self, block_edges=4_000_000):
+        """
+        Yields (first_row, last_row, block) with block a CSR matrix of the
+        in-edges of rows [first_row, last_row), each holding about block_edges edges.
+        """
+        n = self.num_nodes
+        start = 0
+        while start < n:
+            limit = self.indptr[start] + block_edges
+            stop = int(np.searchsorted(self.indptr, limit, side='right')) - 1
+            stop = min(max(stop, start + 1), n)
+            lo, hi = int(self.indptr[start]), int(self.indptr[stop])
+            block = sp.csr_array(
+                (self.weights[lo:hi], self.indices[lo:hi], np.asarray(self.indptr[start:stop + 1]) - lo),
+                shape=(stop - start, n))
+            yield start, stop, block
+            start = stop
+
+    def subgraph(self, nodes):
+        """
+        The DiGraph induced by `nodes` (node ids), reading only their rows, e.g.
+        the part of a graph too large for memory that is plotted.
+        """
+        nodes = np.unique(np.asarray(nodes, dtype=np.int64))
+        starts = np.asarray(self.indptr[nodes], dtype=np.int64)
+        counts = np.asarray(self.indptr[nodes + 1], dtype=np.int64) - starts
+        # Positions of the in-edges of every node, row after row
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        src = np.asarray(self.indices[offsets], dtype=np.int64)
+        dst = np.repeat(nodes, counts)
+        keep = np.isin(src, nodes)
+        G = nx.DiGraph()
+        G.add_nodes_from(nodes.tolist())
+        G.add_weighted_edges_from(zip(src[keep].tolist(), dst[keep].tolist(),
+                                      np.asarray(self.weights[offsets[keep]], dtype=np.float64).tolist()))
+        return G
+
+    def to_edge_list(self):
+        """Loads the whole graph into an in-memory EdgeList (for graphs that fit in RAM)."""
+        dst = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+        return EdgeList(self.num_nodes, np.asarray(self.indices, dtype=np.int64), dst,
+                        np.asarray(self.weights, dtype=np.float64))
+
+
+def pagerank_disk(csr, alpha=0.85, personalization=None, max_iter=100, tol=1.0e-6,
+                  dangling=None, initial_scores=None, block_edges=4_000_000, history=None):
+    """
+    Power-iteration PageRank over a memory-mapped DiskCSR, one row block at a time.
+
+    Same update and convergence rule as pagerank_weighted_iterative; only the
+    score vectors (O(N)) are held in memory.
+
+    Args:
+        csr (DiskCSR): The graph.
+        personalization, dangling, initial_scores (np.ndarray, optional):
+            Vectors indexed by node id (normalized here).
+        block_edges (int): Edges read per block.
+        history (PageRankHistory, optional): Receives every iterate.
+
+    Returns:
+        tuple: (np.ndarray final scores, dict with 'iterations', 'residuals', 'converged')
+    """
+    N = csr.num_nodes
+    if N == 0:
+        return np.zeros(0), {'iterations': 0, 'residuals': np.zeros(0), 'converged': True}
+
+    def normalized(vec, fallback):
+        if vec is None:
+            return fallback
+        vec = np.asarray(vec, dtype=np.float64)
+        s = vec.sum()
+        return vec / s if s != 0 else fallback
+
+    uniform = np.full(N, 1.0 / N)
+    x = normalized(initial_scores, uniform)
+    p = normalized(personalization, uniform)
+    d = normalized(dangling, p)
+
+    out_weight = np.asarray(csr.out_weight)
+    dangling_mask = out_weight == 0
+    inv_out = np.zeros(N)
+    np.divide(1.0, out_weight, out=inv_out, where=~dangling_mask)
+    if history is not None:
+        history.append(x, iteration=0)
+
+    residuals = []
+    converged = False
+    for iteration in range(max_iter):
+        xlast = x
+        scaled = xlast * inv_out # Each node's score per unit of outgoing weight
+        danglesum = alpha * xlast[dangling_mask].sum()
+        x = danglesum * d + (1.0 - alpha) * p
+        for start, stop, block in csr.row_blocks(block_edges):
+            x[start:stop] += alpha * (block @ scaled)
+        if history is not None:
+            history.append(x, iteration=iteration + 1)
+
+        err = np.abs(x - xlast).sum()
+        residuals.append(err)
+        if err < N * tol:
+            converged = True
+            break
+
+    return x, {'iterations': len(residuals), 'residuals': np.asarray(residuals), 'converged': converged}
+
+
+# --- Result bundles (graph + layout + history in one .npz) ---
+
+class ResultBundle(NamedTuple):
+    """A saved run: graph, {node: (x, y, z)} layout, PageRankHistory and the parameters used."""
+    graph: object
+    pos: dict
+    history: PageRankHistory
+    params: dict
+
+
+def _node_array(nodes):
+    """Node labels as a plain (memory-mappable) array: int64 if all are integers, else unicode."""
+    if all(isinstance(n, (int, np.integer)) and not isinstance(n, bool) for n in nodes):
+        return np.asarray(nodes, dtype=np.int64)
+    return np.asarray([str(n) for n in nodes], dtype=np.str_)
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    return value
+
+
+def save_bundle(file, G, pos, history, params=None):
+    """
+    Saves a graph, its layout and its PageRank history as an uncompressed .npz.
+
+    Members (all plain .npy arrays, so load_bundle can memory-map them):
+        nodes (int64 or unicode, N), indptr (int64, N+1), indices (int32, E)
+        and weights (float64, E) - the adjacency in CSR form with one row
+        per source node - positions (float64, N x 3, NaN where missing),
+        scores (iterations x N, the history dtype), iterations (int64) and
+        meta (JSON as uint8: format version, params, history.info).
+
+    Args:
+        file (str or file-like): Destination path or writable binary file.
+        G (nx.DiGraph): The graph.
+        pos (dict): {node: (x, y, z)} layout.
+        history (PageRankHistory): Scores per iteration.
+        params (dict, optional): Parameters of the run (stored as JSON).
+    """
+    nodes = list(G.nodes())
+    index = {n: i for i, n in enumerate(nodes)}
+    n = len(nodes)
+    edges = list(G.edges(data='weight', default=1.0))
+    src = np.fromiter((index[u] for u, _, _ in edges), dtype=np.int64, count=len(edges))
+    dst = np.fromiter((index[v] for _, v, _ in edges), dtype=np.int64, count=len(edges))
+    weight = np.fromiter((w for _, _, w in edges), dtype=np.float64, count=len(edges))
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+
+    positions = np.full((n, 3), np.nan)
+    for i, node in enumerate(nodes):
+        if node in pos:
+            positions[i] = pos[node]
+
+    if history is not None and len(history):
+        columns = np.array([history.index[node] for node in nodes], dtype=np.int64)
+        scores = np.asarray(history.scores)[:, columns]
+        iterations = np.asarray(history.iterations, dtype=np.int64)
+        info = history.info
+    else:
+        scores, iterations, info = np.zeros((0, n)), np.zeros(0, dtype=np.int64), {}
+
+    meta = {'version': BUNDLE_FORMAT_VERSION, 'params': _jsonable(params or {}), 'info': _jsonable(info)}
+    np.savez(file, nodes=_node_array(nodes), indptr=indptr, indices=dst[order].astype(np.int32),
+             weights=weight[order], positions=positions, scores=scores, iterations=iterations,
+             meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8))
+
+
+def bundle_bytes(G, pos, history, params=None):
+    """save_bundle into memory, e.g. for a download button."""
+    buffer = io.BytesIO()
+    save_bundle(buffer, G, pos, history, params)
+    return buffer.getvalue()
+
+
+def _npz_members(path, mmap=True):
+    """
+    Opens the arrays of an .npz file. Uncompressed members are memory-mapped
+    in place (their bytes are stored contiguously inside the zip); compressed
+    ones are read into memory.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for member in archive.infolist():
+            name = member.filename[:-4] if member.filename.endswith('.npy') else member.filename
+            if not mmap or member.compress_type != zipfile.ZIP_STORED:
+                with archive.open(member) as data:
+                    arrays[name] = np.lib.format.read_array(data, allow_pickle=False)
+                continue
+            # Local file header: 30 fixed bytes, then the file name and extra field
+            f.seek(member.header_offset + 26)
+            name_len, extra_len = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(member.header_offset + 30 + int(name_len) + int(extra_len))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            elif version == (2, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            else:
+                raise ValueError(f"Unsupported .npy format version {version} in bundle member {name!r}")
+            if dtype.hasobject:
+                raise ValueError(f"Bundle member {name!r} holds Python objects")
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+def load_bundle(path, mmap=True):
+    """
+    Loads a bundle written by save_bundle.
+
+    With mmap=True the score matrix (the largest part) stays memory-mapped:
+    only the rows that are displayed are read from disk. The graph is rebuilt
+    as a DiGraph.
+
+    Returns:
+        ResultBundle: (graph, pos, history, params)
+    """
+    arrays = _npz_members(path, mmap=mmap)
+    missing = {'nodes', 'indptr', 'indices', 'weights', 'positions', 'scores', 'iterations', 'meta'} - set(arrays)
+    if missing:
+        raise ValueError(f"Not a PageRank bundle (missing {sorted(missing)})")
+    meta = json.loads(np.asarray(arrays['meta']).tobytes().decode('utf-8'))
+    if meta.get('version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version: {meta.get('version')!r}")
+
+    node_array = np.asarray(arrays['nodes'])
+    nodes = node_array.tolist()
+    n = len(nodes)
+    indptr = np.asarray(arrays['indptr'])
+    src = np.repeat(np.arange(n), np.diff(indptr))
+    dst = np.asarray(arrays['indices'], dtype=np.int64)
+    # Nodes are added in their saved order, so G.nodes() matches history.nodes
+    G = nx.DiGraph()
+    G.add_nodes_from(nodes)
+    G.add_weighted_edges_from(zip(node_array[src].tolist(), node_array[dst].tolist(),
+                                  np.asarray(arrays['weights']).tolist()))
+
+    positions = np.asarray(arrays['positions'])
+    pos = {node: positions[i] for i, node in enumerate(nodes) if not np.isnan(positions[i]).any()}
+
+    info = meta.get('info', {})
+    if 'residuals' in info:
+        info['residuals'] = np.asarray(info['residuals'])
+    if 'top_k' in info:
+        info['top_k'] = [tuple(entry) for entry in info['top_k']]
+    history = PageRankHistory.from_arrays(nodes, arrays['scores'], arrays['iterations'], info)
+    return ResultBundle(G, pos, history, meta.get('params', {}))
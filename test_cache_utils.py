@@ -0,0 +1,39 @@
+# test_cache_utils.py
+import numpy as np
+
+from cache_utils import LRUCache, PipelineCache, param_key
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=250)
+    cache.put('a', 1, nbytes=100)
+    cache.put('b', 2, nbytes=100)
+    cache.get('a')
+    cache.put('c', 3, nbytes=100)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.nbytes == 200 and len(cache) == 2
+
+
+def test_lru_spills_evicted_entries_to_disk(tmp_path):
+    cache = LRUCache(max_bytes=150, disk_dir=str(tmp_path))
+    cache.put('a', np.arange(10), nbytes=100)
+    cache.put('b', 'x', nbytes=100)
+    assert len(cache) == 1 and 'a' in cache # Spilled, still reachable
+    np.testing.assert_array_equal(cache.get('a'), np.arange(10))
+    assert cache.disk_hits == 1 and cache.misses == 0
+
+
+def test_pipeline_cache_computes_each_key_once():
+    cache = PipelineCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute('graph', {'n': 10}, compute) == 1
+    assert cache.get_or_compute('graph', {'n': 10}, compute) == 1
+    assert cache.get_or_compute('graph', {'n': 11}, compute) == 2
+    assert cache.stats()['hits'] == 1
+    assert param_key('graph', {'a': 1, 'b': 2}) == param_key('graph', {'b': 2, 'a': 1})
+    assert param_key('graph', {'a': 1}) != param_key('layout', {'a': 1})
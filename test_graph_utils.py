@@ -0,0 +1,107 @@
+# test_graph_utils.py
+import networkx as nx
+import numpy as np
+import pytest
+
+from graph_utils import (GRAPH_MODELS, barabasi_albert_edges, expected_num_edges, generate_edges, limit_density,
+                         random_weighted_edges, rmat_edges, stochastic_block_edges)
+
+
+def _pairs(edges):
+    return set(zip(edges.src.tolist(), edges.dst.tolist()))
+
+
+def _assert_same_edges(a, b):
+    for x, y in zip(a, b):
+        np.testing.assert_array_equal(x, y)
+
+
+def test_random_edges_are_simple_and_seeded():
+    edges = random_weighted_edges(500, edge_prob=0.02, seed=3)
+    assert not np.any(edges.src == edges.dst)
+    assert len(_pairs(edges)) == edges.num_edges
+    assert edges.weight.min() >= 1 and edges.weight.max() <= 10
+    _assert_same_edges(edges, random_weighted_edges(500, edge_prob=0.02, seed=3))
+
+
+def test_random_edge_count_matches_probability():
+    n, p = 2000, 0.01
+    expected = p * n * (n - 1)
+    assert abs(random_weighted_edges(n, edge_prob=p, seed=1).num_edges - expected) < 5 * np.sqrt(expected)
+
+
+def test_sparse_random_graph_is_weakly_connected():
+    edges = random_weighted_edges(300, edge_prob=0.002, seed=5)
+    assert nx.is_weakly_connected(edges.to_digraph())
+    assert edges.to_csr().sum() == edges.weight.sum()
+
+
+@pytest.mark.parametrize('model', list(GRAPH_MODELS))
+def test_models_are_simple_seeded_and_connected(model):
+    edges = generate_edges(model, 1000, seed=2)
+    assert edges.num_nodes == 1000
+    assert not np.any(edges.src == edges.dst)
+    assert len(_pairs(edges)) == edges.num_edges
+    assert nx.is_weakly_connected(edges.to_digraph())
+    _assert_same_edges(edges, generate_edges(model, 1000, seed=2))
+
+
+def test_barabasi_albert_degrees():
+    n, m = 5000, 3
+    edges = barabasi_albert_edges(n, m=m, seed=1, connect=False)
+    assert 0.9 * n * m < edges.num_edges <= n * m
+    assert np.all(edges.src > edges.dst) # Newer nodes link to older ones
+    in_degree = np.bincount(edges.dst, minlength=n)
+    assert in_degree.max() > 20 * in_degree.mean() # Heavy-tailed
+
+
+def test_rmat_edge_budget():
+    edges = rmat_edges(4096, avg_degree=4, seed=1, connect=False)
+    assert 0 < edges.num_edges <= 4 * 4096
+    assert edges.src.max() < 4096 and edges.dst.max() < 4096
+
+
+def test_rmat_reaches_edge_target():
+    assert rmat_edges(4096, avg_degree=4, seed=1, connect=False).num_edges == 4 * 4096
+    assert rmat_edges(10, avg_degree=100, seed=1, connect=False).num_edges == 10 * 9 # Every possible pair
+
+
+def test_connect_adds_one_edge_per_extra_component():
+    plain = random_weighted_edges(300, edge_prob=0.002, seed=5, connect=False)
+    components = nx.number_weakly_connected_components(plain.to_digraph())
+    patched = random_weighted_edges(300, edge_prob=0.002, seed=5)
+    assert components > 1 and patched.num_edges == plain.num_edges + components - 1
+    assert nx.is_weakly_connected(patched.to_digraph())
+
+
+def test_stochastic_block_densities():
+    edges = stochastic_block_edges([200, 200], p_in=0.1, p_out=0.01, seed=4, connect=False)
+    same = (edges.src < 200) == (edges.dst < 200)
+    for count, expected in ((same.sum(), 0.1 * 2 * 200 * 199), ((~same).sum(), 0.01 * 2 * 200 * 200)):
+        assert abs(count - expected) < 5 * np.sqrt(expected)
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        generate_edges('Watts-Strogatz', 10)
+
+
+def test_limit_density_caps_expected_edges():
+    for model, params in (('Erdős–Rényi', {'edge_prob': 0.15}), ('Stochastic Block', {'p_in': 0.2, 'p_out': 0.01})):
+        limited = limit_density(model, 20_000, params, 200_000)
+        assert expected_num_edges(model, 20_000, **limited) == pytest.approx(200_000)
+        assert expected_num_edges(model, 20_000, **params) > 200_000
+    assert limit_density('R-MAT', 20_000, {'avg_degree': 8}, 100) == {'avg_degree': 8}
+    assert limit_density('Erdős–Rényi', 100, {'edge_prob': 0.1}, 200_000) == {'edge_prob': 0.1}
+
+
+class _Stop(Exception):
+    pass
+
+
+@pytest.mark.parametrize('model', list(GRAPH_MODELS))
+def test_generation_can_be_cancelled(model):
+    def cancel_check():
+        raise _Stop()
+    with pytest.raises(_Stop):
+        generate_edges(model, 1000, seed=0, cancel_check=cancel_check)
@@ -0,0 +1,50 @@
+# test_history_utils.py
+import numpy as np
+
+from history_utils import PageRankHistory
+
+
+def test_rows_read_back_as_score_views():
+    history = PageRankHistory(['a', 'b'], capacity=1) # Grows past the preallocated row
+    history.append({'a': 0.5, 'b': 0.5})
+    history.append(np.array([0.25, 0.75]))
+    assert len(history) == 2 and list(history.iterations) == [0, 1]
+    assert dict(history[-1]) == {'a': 0.25, 'b': 0.75}
+    assert history[0]['a'] == 0.5
+    np.testing.assert_array_equal(history.scores, [[0.5, 0.5], [0.25, 0.75]])
+
+
+def test_stride_skips_rows_but_keeps_the_last():
+    history = PageRankHistory(['a', 'b'], stride=3)
+    for i in range(8):
+        history.append([i, -i], iteration=i)
+    assert list(history.finalize().iterations) == [0, 3, 6, 7]
+
+
+def test_delta_skips_rows_that_barely_moved():
+    history = PageRankHistory(['a'], delta=0.1)
+    for i, value in enumerate([1.0, 1.05, 1.2, 1.25]):
+        history.append([value], iteration=i)
+    assert list(history.finalize().iterations) == [0, 2, 3]
+
+
+def test_float32_storage():
+    history = PageRankHistory(range(100), capacity=10, dtype=np.float32)
+    history.append(np.full(100, 0.01))
+    assert history.scores.dtype == np.float32
+    assert history.nbytes == 10 * 100 * 4 + 10 * 8
+
+
+def test_no_stride_keeps_only_the_last_row():
+    history = PageRankHistory(['a', 'b'], capacity=1, stride=None)
+    for i in range(5):
+        history.append([i, -i], iteration=i)
+    assert list(history.finalize().iterations) == [4] and history.nbytes == 2 * 8 + 8
+
+
+def test_range_nodes_are_indexed_without_a_dict():
+    history = PageRankHistory(range(4), capacity=1)
+    history.append(np.array([0.1, 0.2, 0.3, 0.4]))
+    assert history.nodes == range(4) and not isinstance(history.index, dict)
+    assert history[0][2] == 0.3 and history[0].get(4) is None and history[0].get('2') is None
+    assert list(history[0].items())[1] == (1, 0.2)
@@ -0,0 +1,76 @@
+# test_job_utils.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from graph_utils import calculate_layout, create_graph
+from job_utils import BackgroundJob, JobCancelled
+from pagerank_utils import pagerank_weighted_iterative
+
+
+def _spin(job):
+    while True:
+        job.report('spin')
+        time.sleep(0.001)
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        assert time.perf_counter() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_cancel_stops_a_running_job():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        job = BackgroundJob(executor, _spin)
+        _wait_for(lambda: job.stage == 'spin')
+        job.cancel()
+        with pytest.raises(JobCancelled):
+            job.result()
+    assert job.done() and job.cancelled
+
+
+def test_cancelled_queued_job_never_starts():
+    started = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        blocker = BackgroundJob(executor, _spin)
+        queued = BackgroundJob(executor, started.append)
+        queued.cancel()
+        blocker.cancel()
+        with pytest.raises(JobCancelled):
+            queued.result()
+    assert started == []
+
+
+def test_pagerank_callback_streams_progress():
+    G = create_graph('Erdős–Rényi', 50, seed=0, edge_prob=0.1)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        job = BackgroundJob(executor, lambda job: pagerank_weighted_iterative(G, callback=job.pagerank_callback()))
+        _, history = job.result()
+    assert job.stage == 'pagerank' and job.iteration == history.info['iterations']
+    assert job.partial['history'] is history
+
+
+def test_cancel_stops_a_layout():
+    G = create_graph('Barabási–Albert', 5000, seed=0, m=2)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        job = BackgroundJob(executor, lambda job: calculate_layout(G, seed=0, method='barnes_hut',
+                                                                   cancel_check=job.check_cancelled))
+        time.sleep(0.05)
+        job.cancel()
+        start = time.perf_counter()
+        with pytest.raises(JobCancelled):
+            job.result()
+    assert time.perf_counter() - start < 2.0 # Stopped within an iteration, not after the whole layout
+
+
+def test_helper_task_shares_the_cancel_flag():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        job = BackgroundJob(executor, _spin)
+        helper = job.submit(_spin)
+        _wait_for(lambda: job.stage == 'spin')
+        job.cancel()
+        with pytest.raises(JobCancelled):
+            helper.result()
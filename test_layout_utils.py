@@ -0,0 +1,41 @@
+# test_layout_utils.py
+import numpy as np
+import pytest
+
+from graph_utils import create_graph
+from layout_utils import LAYOUT_METHODS, layout_array
+
+
+@pytest.fixture(scope='module')
+def graph():
+    return create_graph('Barabási–Albert', 300, seed=1, m=2)
+
+
+@pytest.mark.parametrize('method', sorted(LAYOUT_METHODS))
+def test_layout_is_seeded(graph, method):
+    pos, nodes = layout_array(graph, method=method, seed=4)
+    assert nodes == list(graph)
+    assert pos.shape == (300, 3) and np.isfinite(pos).all()
+    np.testing.assert_array_equal(pos, layout_array(graph, method=method, seed=4)[0])
+    assert not np.allclose(pos, pos[0]) # Nodes are spread out
+
+
+def test_unknown_layout_method(graph):
+    with pytest.raises(ValueError):
+        layout_array(graph, method='circular')
+
+
+class _Stop(Exception):
+    pass
+
+
+@pytest.mark.parametrize('method', sorted(LAYOUT_METHODS))
+def test_layout_can_be_cancelled(method):
+    G = create_graph('Barabási–Albert', 1000, seed=1, m=2) # Large enough for the iterative eigensolver
+    calls = []
+    def cancel_check():
+        calls.append(None)
+        if len(calls) == 3:
+            raise _Stop()
+    with pytest.raises(_Stop):
+        layout_array(G, method=method, seed=0, cancel_check=cancel_check)
@@ -0,0 +1,73 @@
+# test_metrics_utils.py
+import json
+import os
+import pstats
+import threading
+
+from metrics_utils import Metrics
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    with metrics.timer('block'):
+        pass
+    metrics.increment('hits')
+    metrics.append('steps', residual=0.5)
+    assert metrics.snapshot() == {'enabled': False, 'timers': {}, 'counters': {}, 'series': {}}
+
+
+def test_timers_counters_and_series():
+    metrics = Metrics(enabled=True)
+
+    @metrics.timed('call')
+    def call():
+        return 1
+
+    call()
+    call()
+    with metrics.timer('block'):
+        pass
+    metrics.increment('hits', 2)
+    metrics.append('steps', residual=0.5)
+    metrics.append('steps', residual=0.25)
+    snapshot = json.loads(metrics.to_json())
+    assert snapshot['timers']['call']['count'] == 2 and snapshot['timers']['block']['count'] == 1
+    assert snapshot['counters'] == {'hits': 2}
+    assert [r['residual'] for r in snapshot['series']['steps']] == [0.5, 0.25]
+    metrics.clear_series('steps')
+    assert 'steps' not in metrics.snapshot()['series']
+
+
+def test_profile_is_collected_and_exported(tmp_path):
+    metrics = Metrics(enabled=True)
+    with metrics.profile():
+        sum(range(100))
+    assert not metrics.has_profile # Profiling is a separate switch
+    metrics.profiling = True
+    with metrics.profile():
+        sorted(range(100))
+    assert metrics.has_profile and 'function calls' in metrics.profile_text()
+    path = os.path.join(tmp_path, 'profile.pstats')
+    metrics.dump_stats(path)
+    assert pstats.Stats(path).total_calls > 0
+
+
+def test_thread_settings_and_scoped_series():
+    metrics = Metrics()
+
+    def run(scope, residual):
+        with metrics.local(enabled=True, scope=scope):
+            metrics.clear_series('steps')
+            metrics.append('steps', residual=residual)
+            metrics.increment('runs')
+
+    threads = [threading.Thread(target=run, args=(scope, r)) for scope, r in (('a', 0.5), ('b', 0.25))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not metrics.enabled and metrics.counters == {'runs': 2}
+    assert metrics.snapshot()['series'] == {} # The shared scope recorded nothing
+    metrics.use_local(enabled=False, scope='a')
+    assert metrics.snapshot()['series'] == {'steps': [{'residual': 0.5}]}
+    metrics.clear_local()
@@ -0,0 +1,230 @@
+# test_pagerank_utils.py
+import os
+import threading
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from graph_utils import create_graph
+from pagerank_utils import (SOLVERS, IncrementalPageRank, MonteCarloPageRank, TransitionMatrix, compare_solvers,
+                            pagerank_batch, pagerank_weighted_iterative, top_k_scores)
+from storage_utils import convert_edge_list, load_bundle, save_bundle
+
+
+TOL = 1.0e-12 # Convergence tolerance for the runs being compared
+ATOL = 1.0e-9 # Allowed score difference between engines
+
+
+def _as_array(scores, nodes):
+    return np.array([scores[n] for n in nodes])
+
+
+@pytest.fixture
+def graph():
+    """Small weighted graph with dangling nodes, a self-loop and an isolated node."""
+    G = nx.DiGraph()
+    G.add_nodes_from(range(30))
+    rng = np.random.default_rng(7)
+    for u in range(25): # Nodes 25..29 have no out-links
+        for v in rng.choice(30, size=rng.integers(1, 5), replace=False):
+            G.add_edge(u, int(v), weight=float(rng.uniform(0.5, 5.0)))
+    G.add_edge(3, 3, weight=2.0)
+    G.remove_edges_from(list(G.in_edges(29)))
+    return G
+
+
+def _options(G):
+    """personalization / dangling / initial_scores variants, each covering all nodes."""
+    rng = np.random.default_rng(1)
+    random_dict = lambda: {n: float(rng.random()) for n in G}
+    return {
+        'plain': {},
+        'personalization': {'personalization': random_dict()},
+        'dangling': {'dangling': random_dict()},
+        'initial_scores': {'initial_scores': random_dict()},
+        'all': {'personalization': random_dict(), 'dangling': random_dict(), 'initial_scores': random_dict()},
+    }
+
+
+@pytest.mark.parametrize('variant', ['plain', 'personalization', 'dangling', 'initial_scores', 'all'])
+def test_sparse_matches_dict(graph, variant):
+    kwargs = _options(graph)[variant]
+    sparse, sparse_history = pagerank_weighted_iterative(graph, tol=1e-8, **kwargs)
+    reference, dict_history = pagerank_weighted_iterative(graph, tol=1e-8, engine='dict', **kwargs)
+    assert len(sparse_history) == len(dict_history)
+    np.testing.assert_allclose(_as_array(sparse, graph), _as_array(reference, graph), rtol=0, atol=1e-15)
+    for row, expected in zip(sparse_history, dict_history):
+        np.testing.assert_allclose(_as_array(row, graph), _as_array(expected, graph), rtol=0, atol=1e-15)
+
+
+def test_empty_graph():
+    assert pagerank_weighted_iterative(nx.DiGraph())[0] == {}
+    assert pagerank_weighted_iterative(nx.DiGraph(), engine='dict')[0] == {}
+
+
+@pytest.mark.parametrize('method', sorted(SOLVERS))
+def test_solvers_match_power(graph, method):
+    kwargs = _options(graph)['all']
+    expected, _ = pagerank_weighted_iterative(graph, tol=TOL, max_iter=1000, **kwargs)
+    scores, history = pagerank_weighted_iterative(graph, tol=TOL, max_iter=1000, method=method, **kwargs)
+    assert history.info['converged'] and history.info['method'] == method
+    np.testing.assert_allclose(_as_array(scores, graph), _as_array(expected, graph), rtol=0, atol=ATOL)
+
+
+def test_compare_solvers_reports_every_method(graph):
+    reports = compare_solvers(graph, tol=1e-8)
+    assert sorted(r['method'] for r in reports) == sorted(SOLVERS)
+    with pytest.raises(ValueError):
+        pagerank_weighted_iterative(graph, method='newton')
+
+
+@pytest.mark.parametrize('method', ['push', 'warm'])
+def test_incremental_matches_recompute(graph, method):
+    incremental = IncrementalPageRank(graph, tol=TOL, max_iter=1000)
+    deltas = [
+        {'added': [(25, 0, 2.0), (0, 29, 1.0)]}, # A dangling node gets a link; a new column entry
+        {'removed': list(graph.out_edges(1))}, # Node 1 becomes dangling
+        {'reweighted': [(u, v, 7.0) for u, v in list(graph.out_edges(2))[:2]]},
+        {'added': [(3, 3, 0.5)]}, # Existing edge: sets its weight
+    ]
+    for delta in deltas:
+        for u, v, *w in delta.get('added', []) + delta.get('reweighted', []):
+            graph.add_edge(u, v, weight=w[0])
+        graph.remove_edges_from(delta.get('removed', []))
+        scores = incremental.update(method=method, **delta)
+        expected, _ = pagerank_weighted_iterative(graph, tol=TOL, max_iter=1000)
+        np.testing.assert_allclose(_as_array(scores, graph), _as_array(expected, graph), rtol=0, atol=1e-8)
+
+
+def test_incremental_rejects_missing_edges(graph):
+    incremental = IncrementalPageRank(graph)
+    with pytest.raises(ValueError):
+        incremental.update(removed=[(29, 0)])
+    with pytest.raises(ValueError):
+        incremental.update(added=[(0, 'missing', 1.0)])
+
+
+def test_batch_matches_single_runs(graph):
+    seed_node = 4
+    columns, info = pagerank_batch(graph, alphas=[0.85, 0.5, 0.95], personalizations=[None, None, seed_node], tol=TOL,
+                                   max_iter=1000)
+    assert info['converged'].all()
+    for scores, alpha, personalization in zip(columns, [0.85, 0.5, 0.95],
+                                              [None, None, {n: float(n == seed_node) for n in graph}]):
+        expected, _ = pagerank_weighted_iterative(graph, alpha=alpha, personalization=personalization, tol=TOL,
+                                                  max_iter=1000)
+        np.testing.assert_allclose(_as_array(scores, graph), _as_array(expected, graph), rtol=0, atol=ATOL)
+
+
+def _disk_copy(graph, tmp_path, header=False):
+    """Writes the graph as a CSV edge list and converts it to an on-disk CSR."""
+    path = os.path.join(tmp_path, 'edges.csv')
+    with open(path, 'w') as f:
+        if header:
+            f.write("src,dst,weight\n")
+        f.writelines(f"{u},{v},{w}\n" for u, v, w in graph.edges(data='weight'))
+    return convert_edge_list(path, os.path.join(tmp_path, 'csr'), num_nodes=len(graph)) # Node 29 has no edges
+
+
+def test_disk_matches_sparse(graph, tmp_path):
+    csr = _disk_copy(graph, tmp_path)
+    kwargs = _options(graph)['all']
+    expected, _ = pagerank_weighted_iterative(graph, tol=TOL, max_iter=1000, **kwargs)
+    scores, _ = pagerank_weighted_iterative(csr, tol=TOL, max_iter=1000, **kwargs)
+    # Disk weights are float32, so the results differ at that precision
+    np.testing.assert_allclose(_as_array(scores, graph), _as_array(expected, graph), rtol=0, atol=1e-6)
+
+
+def test_parallel_matches_sparse(graph):
+    expected, _ = pagerank_weighted_iterative(graph, tol=TOL, max_iter=1000)
+    results = [pagerank_weighted_iterative(graph, tol=TOL, max_iter=1000, engine='parallel', workers=w)[0]
+               for w in (1, 3)]
+    np.testing.assert_allclose(_as_array(results[0], graph), _as_array(expected, graph), rtol=0, atol=ATOL)
+    assert results[0] == results[1] # Bitwise-identical for any worker count
+
+
+def test_top_k_matches_full_ranking():
+    G = create_graph('R-MAT', 3000, seed=3, avg_degree=4)
+    scores, _ = pagerank_weighted_iterative(G, tol=TOL, max_iter=1000)
+    _, history = pagerank_weighted_iterative(G, tol=TOL, max_iter=1000, top_k=5)
+    certain = [node for (node, _), ok in zip(history.info['top_k'], history.info['top_k_certain']) if ok]
+    expected = sorted(scores, key=scores.get, reverse=True)[:5]
+    assert certain == expected[:len(certain)]
+    assert [node for node, _ in top_k_scores(scores, 5)] == expected
+
+
+def _bundle_round_trip(G, tmp_path):
+    scores, history = pagerank_weighted_iterative(G)
+    path = os.path.join(tmp_path, 'run.npz')
+    save_bundle(path, G, {n: (0.0, 0.0, float(i)) for i, n in enumerate(G)}, history, {'alpha': 0.85})
+    bundle = load_bundle(path)
+    assert list(bundle.graph.nodes()) == bundle.history.nodes == list(G)
+    assert sorted(bundle.graph.edges(data='weight')) == sorted(G.edges(data='weight'))
+    assert dict(bundle.history[-1]) == scores
+    assert bundle.params == {'alpha': 0.85}
+    assert set(bundle.pos) == set(G)
+
+
+def test_bundle_round_trip(tmp_path):
+    G = nx.DiGraph()
+    G.add_weighted_edges_from([('b', 'a', 2.0), ('c', 'b', 1.0), ('a', 'c', 0.5)])
+    _bundle_round_trip(G, tmp_path)
+
+
+def test_monte_carlo_estimate(graph):
+    expected, _ = pagerank_weighted_iterative(graph, tol=TOL, max_iter=1000)
+    estimator = MonteCarloPageRank(graph, seed=0).run(200_000, batch_size=20_000)
+    error = np.abs(estimator.scores - _as_array(expected, estimator.T.nodes))
+    assert error.max() < 6 * estimator.stderr.max()
+
+
+def test_monte_carlo_stops_and_rejects_endless_walks(graph):
+    stop = threading.Event()
+    stop.set()
+    assert MonteCarloPageRank(graph, seed=0).run(1_000_000, stop=stop).walks == 0
+    with pytest.raises(ValueError):
+        MonteCarloPageRank(graph, alpha=1.0)
+
+
+def test_edge_delta_matches_rebuilt_matrix(graph):
+    T = TransitionMatrix(graph)
+    T.build_by_source() # Deltas patch the column-oriented copy
+    added, removed = [(25, 0, 2.0), (0, 29, 1.0), (4, 7, 3.0)], list(graph.out_edges(1))
+    T.apply_edge_delta(added=added, removed=removed)
+    graph.add_weighted_edges_from(added)
+    graph.remove_edges_from(removed)
+    expected = TransitionMatrix(graph)
+    np.testing.assert_allclose(T.matrix.toarray(), expected.matrix.toarray(), rtol=0, atol=1e-15)
+    np.testing.assert_array_equal(T.dangling_mask, expected.dangling_mask)
+
+
+def test_history_stride_trims_rows(graph):
+    _, history = pagerank_weighted_iterative(graph, tol=TOL, max_iter=5000, history_stride=10)
+    assert list(history.iterations) == list(range(0, history.info['iterations'], 10)) + [history.info['iterations']]
+    assert history.scores.shape[0] == history._data.shape[0]
+
+
+def test_disk_history_follows_stride(graph, tmp_path):
+    csr = _disk_copy(graph, tmp_path)
+    scores, history = pagerank_weighted_iterative(csr, tol=TOL, max_iter=1000)
+    assert len(history) == 1 and history.iterations[0] == history.info['iterations'] # Final scores only
+    assert dict(history[-1]) == scores
+    _, history = pagerank_weighted_iterative(csr, tol=TOL, max_iter=1000, history_stride=10)
+    assert list(history.iterations) == list(range(0, history.info['iterations'], 10)) + [history.info['iterations']]
+
+
+def test_bundle_keeps_integer_node_order(tmp_path):
+    G = nx.DiGraph()
+    G.add_nodes_from([1, 0, 2]) # Integer labels that are not in index order
+    G.add_edge(1, 0, weight=2.0)
+    G.add_edge(2, 1, weight=1.0)
+    _bundle_round_trip(G, tmp_path)
+
+
+def test_extrapolation_is_not_slower_than_power():
+    G = create_graph('Barabási–Albert', 2000, seed=1, m=2)
+    _, power = pagerank_weighted_iterative(G, tol=1e-10, max_iter=1000)
+    for method in ('aitken', 'quadratic'):
+        _, history = pagerank_weighted_iterative(G, tol=1e-10, max_iter=1000, method=method)
+        assert history.info['iterations'] <= power.info['iterations']
@@ -0,0 +1,93 @@
+# test_plot_utils.py
+import networkx as nx
+import numpy as np
+import pytest
+
+from pagerank_utils import pagerank_weighted_iterative
+from plot_utils import FigureTemplate, select_level_of_detail, select_visible_nodes
+
+
+@pytest.fixture
+def graph():
+    G = nx.DiGraph()
+    G.add_weighted_edges_from([(0, 1, 2.0), (1, 2, 1.0), (2, 0, 3.0), (3, 0, 1.5), (3, 4, 1.0), (4, 5, 2.5)])
+    return G
+
+
+@pytest.fixture
+def template(graph):
+    pos = {n: (float(n), float(n * n % 5), -float(n)) for n in graph}
+    return FigureTemplate(graph, pos, list(graph.nodes()), list(graph.edges(data=True)))
+
+
+def test_template_precomputes_edges_and_degrees(graph, template):
+    assert template.edge_segments.shape == (3 * graph.number_of_edges(), 3)
+    assert np.isnan(template.edge_segments[2::3]).all()
+    np.testing.assert_allclose(template.customdata[:, 1].astype(float),
+                               [graph.in_degree(n, weight='weight') for n in template.nodes])
+    np.testing.assert_allclose(template.customdata[:, 2].astype(float),
+                               [graph.out_degree(n, weight='weight') for n in template.nodes])
+
+
+def test_figure_only_swaps_node_markers(graph, template):
+    first = template.figure({n: 1.0 for n in graph}, 0, 0.85)
+    scores = {n: float(n) for n in graph}
+    second = template.figure(scores, 1, 0.85)
+    np.testing.assert_array_equal(np.asarray(first.data[0].x, dtype=float), np.asarray(second.data[0].x, dtype=float))
+    np.testing.assert_allclose(second.data[1].marker.color, [scores[n] for n in template.nodes])
+
+
+def test_history_rows_match_dict_scores(graph, template):
+    scores, history = pagerank_weighted_iterative(graph)
+    np.testing.assert_array_equal(template.score_array(history[-1]), template.score_array(scores))
+
+
+def test_animated_figure_has_one_frame_per_row(graph, template):
+    _, history = pagerank_weighted_iterative(graph, history_stride=2)
+    fig = template.animated_figure(history, 0.85)
+    assert [frame.name for frame in fig.frames] == [str(i) for i in history.iterations]
+    assert all(frame.traces == (1,) for frame in fig.frames) # The edge trace is sent once
+    assert len(fig.layout.sliders[0].steps) == len(history)
+
+
+def _large_graph_arrays(N=5000, E=400_000):
+    rng = np.random.default_rng(0)
+    return rng.pareto(2.0, N), rng.integers(N, size=E), rng.integers(N, size=E), rng.random(E)
+
+
+def test_level_of_detail_respects_budgets():
+    scores, src, dst, weight = _large_graph_arrays()
+    visible, edges = select_level_of_detail(scores, src, dst, weight, max_nodes=500, max_edges=2000, top_k=100, seed=1)
+    assert len(visible) == 500
+    assert set(np.argsort(scores)[-100:].tolist()) <= set(visible.tolist()) # Top-k always drawn
+    assert len(edges) == 2000
+    assert np.isin(src[edges], visible).all() and np.isin(dst[edges], visible).all()
+    again = select_level_of_detail(scores, src, dst, weight, max_nodes=500, max_edges=2000, top_k=100, seed=1)
+    np.testing.assert_array_equal(visible, again[0])
+    np.testing.assert_array_equal(edges, again[1])
+
+
+def test_small_graph_is_drawn_in_full():
+    scores, src, dst, weight = _large_graph_arrays(N=100, E=300)
+    visible, edges = select_level_of_detail(scores, src, dst, weight)
+    np.testing.assert_array_equal(visible, np.arange(100))
+    np.testing.assert_array_equal(edges, np.arange(300))
+
+
+def test_render_modes(graph):
+    pos = {n: (float(n), float(n * n % 5), -float(n)) for n in graph}
+    args = (graph, pos, list(graph.nodes()), list(graph.edges(data=True)))
+    webgl = FigureTemplate(*args, webgl_threshold=3)
+    assert webgl.mode == 'webgl' and webgl.coords.shape == (len(graph), 2)
+    density = FigureTemplate(*args, render_mode='density')
+    assert density.num_edges_shown == 0
+    with pytest.raises(ValueError):
+        FigureTemplate(*args, render_mode='svg')
+
+
+def test_visible_nodes_match_the_level_of_detail():
+    rng = np.random.default_rng(0)
+    scores = rng.random(5000)
+    src, dst = rng.integers(0, 5000, size=(2, 20000))
+    visible, _ = select_level_of_detail(scores, src, dst, np.ones(20000), max_nodes=300, top_k=50)
+    np.testing.assert_array_equal(select_visible_nodes(scores, max_nodes=300, top_k=50), visible)
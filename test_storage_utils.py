@@ -0,0 +1,43 @@
+# test_storage_utils.py
+import os
+
+import pytest
+
+from storage_utils import convert_edge_list, load_edge_list_bytes
+
+
+EDGES = [(0, 1, 2.0), (1, 2, 1.0), (2, 0, 0.5), (3, 0, 4.0)]
+
+
+def _edge_arrays(csr):
+    edges = csr.to_edge_list()
+    return sorted(zip(edges.src.tolist(), edges.dst.tolist(), edges.weight.tolist()))
+
+
+@pytest.mark.parametrize('name, text', [
+    ('edges.csv', "src,dst,weight\n" + "".join(f"{u},{v},{w}\n" for u, v, w in EDGES)),
+    ('edges.csv', "".join(f"{u},{v},{w}\n" for u, v, w in EDGES)),
+    ('edges.tsv', "src\tdst\tweight\n" + "".join(f"{u}\t{v}\t{w}\n" for u, v, w in EDGES)),
+    ('edges.txt', "# comment\n" + "".join(f"{u} {v} {w}\n" for u, v, w in EDGES)),
+])
+def test_edge_list_header_is_detected(tmp_path, name, text):
+    path = os.path.join(tmp_path, name)
+    with open(path, 'w') as f:
+        f.write(text)
+    csr = convert_edge_list(path, os.path.join(tmp_path, 'csr'))
+    assert csr.num_nodes == 4
+    assert _edge_arrays(csr) == sorted(EDGES)
+
+
+def test_uploaded_bytes_are_converted(tmp_path):
+    data = ("src,dst,weight\n" + "".join(f"{u},{v},{w}\n" for u, v, w in EDGES)).encode()
+    csr = load_edge_list_bytes(data, 'edges.csv', work_dir=str(tmp_path))
+    assert _edge_arrays(csr) == sorted(EDGES)
+
+
+def test_subgraph_reads_only_the_given_nodes(tmp_path):
+    data = "".join(f"{u},{v},{w}\n" for u, v, w in EDGES).encode()
+    csr = load_edge_list_bytes(data, 'edges.csv', work_dir=str(tmp_path))
+    G = csr.subgraph([2, 0, 3])
+    assert sorted(G.nodes()) == [0, 2, 3]
+    assert sorted(G.edges(data='weight')) == [(2, 0, 0.5), (3, 0, 4.0)]